@@ -0,0 +1,73 @@
+# benchmarks/bench_exporter.py
+"""Scrape latency of the exporter against a retention-sized data directory.
+
+Builds a throwaway /data tree with one directory per collected command holding a
+week of 30-second files (20160 each by default) plus its latest.json, then times
+/metrics over HTTP in 'scan' and 'latest' mode.
+
+    python benchmarks/bench_exporter.py [--files 20160] [--scrapes 20]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import HTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'exporter'))
+import exporter
+
+COMMANDS = [
+    "display_sfwd_drop_statistics", "display_portstatistics_portnum_1", "wap_top",
+    "display_lanport_workmode", "display_dhcp_server_user_all", "display_deviceinfo",
+    "display_wifi_associate", "display_wifi_information", "display_waninfo_all_detail",
+]
+
+def build_data_dir(root, files_per_command):
+    now = time.time()
+    for command in COMMANDS:
+        command_dir = os.path.join(root, command)
+        os.makedirs(command_dir)
+        content = "\n".join(f'{command}_metric_{i}{{command="{command}",port="unknown"}} {i}' for i in range(20))
+        for i in range(files_per_command):
+            path = os.path.join(command_dir, f"{command}_{i:06d}.txt")
+            with open(path, 'w') as f: f.write(content)
+            mtime = now - (files_per_command - i) * 30
+            os.utime(path, (mtime, mtime))
+        labels = f'{{command="{command}",port="unknown"}}'
+        families = [[f'{command}_metric_{i}', 'gauge', 'Benchmark series.', [[labels, i]]] for i in range(20)]
+        with open(os.path.join(command_dir, exporter.LATEST_FILENAME), 'w') as f: json.dump({'timestamp': now, 'families': families}, f)
+
+def time_scrapes(port, scrapes):
+    samples = []
+    for _ in range(scrapes):
+        start = time.perf_counter()
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response: response.read()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2], samples[-1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=20160, help="files per command directory")
+    parser.add_argument('--scrapes', type=int, default=20)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as root:
+        print(f"Building {len(COMMANDS)} x {args.files} files in {root}...")
+        build_data_dir(root, args.files)
+        exporter.DATA_DIR = root
+        exporter.store = exporter.SnapshotStore(root)
+        exporter.store.refresh()
+        httpd = HTTPServer(('127.0.0.1', 0), exporter.MetricsHandler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        for mode in ('scan', 'latest'):
+            exporter.MODE = mode
+            median, worst = time_scrapes(httpd.server_address[1], args.scrapes)
+            print(f"{mode:>6}: median {median * 1000:8.2f} ms   max {worst * 1000:8.2f} ms")
+        httpd.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_parsers.py
+"""Parse throughput of every registered parser over the recorded sample outputs.
+
+Each file in benchmarks/samples/ is a raw device reply (echo line first), named
+after its command. Reports parses/s, lines/s and series/s per command; --save
+stores the result and --compare fails (exit 1) when any command got slower than
+the saved baseline by more than --tolerance.
+
+    python benchmarks/bench_parsers.py [--duration 0.5] [--save base.json | --compare base.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'collector'))
+import parsers
+
+SAMPLES_DIR = os.path.join(HERE, 'samples')
+
+def load_samples(samples_dir=SAMPLES_DIR):
+    """Returns {command: content_lines} with the same echo/'success!' filtering as the collector."""
+    samples = {}
+    for filename in sorted(os.listdir(samples_dir)):
+        if not filename.endswith('.txt'): continue
+        with open(os.path.join(samples_dir, filename), encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        samples[lines[0].strip()] = [line for line in lines[1:] if not line.lower().startswith('success!')]
+    return samples
+
+def bench(command, lines, duration, repeats=3):
+    """Best of `repeats` timed rounds, which keeps scheduler noise out of --compare."""
+    parser_func = parsers.get_parser(command)
+    command_prefix = command.replace(' ', '_')
+    base_labels = {'command': command_prefix, 'port': 'unknown', 'device': 'bench'}
+    series = len(list(parser_func(lines, command_prefix, base_labels)))
+    rate = 0
+    for _ in range(repeats):
+        runs, start = 0, time.perf_counter()
+        while True:
+            list(parser_func(lines, command_prefix, base_labels))
+            runs += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= duration / repeats: break
+        rate = max(rate, runs / elapsed)
+    return {'parses_per_s': rate, 'lines_per_s': rate * len(lines), 'series_per_s': rate * series, 'series': series}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=0.5, help="seconds spent on each command")
+    parser.add_argument('--save', help="write results to this JSON file")
+    parser.add_argument('--compare', help="baseline JSON file written by --save")
+    parser.add_argument('--tolerance', type=float, default=0.3, help="allowed slowdown vs. baseline (0.3 = 30%%)")
+    args = parser.parse_args()
+    baseline = json.load(open(args.compare)) if args.compare else {}
+    results, regressions = {}, []
+    print(f"{'command':<36}{'series':>8}{'parses/s':>12}{'lines/s':>12}{'series/s':>12}")
+    for command, lines in load_samples().items():
+        result = results[command] = bench(command, lines, args.duration)
+        note = ""
+        if command in baseline:
+            ratio = result['parses_per_s'] / baseline[command]['parses_per_s']
+            note = f"  {ratio:6.2f}x"
+            if ratio < 1 - args.tolerance: regressions.append(command)
+        print(f"{command:<36}{result['series']:>8}{result['parses_per_s']:>12.0f}{result['lines_per_s']:>12.0f}{result['series_per_s']:>12.0f}{note}")
+    if args.save:
+        with open(args.save, 'w') as f: json.dump(results, f, indent=2)
+    if regressions:
+        print(f"Regression beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
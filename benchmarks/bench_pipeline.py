@@ -0,0 +1,158 @@
+# benchmarks/bench_pipeline.py
+"""End-to-end throughput of the collector and exporter, without a device.
+
+Replays device outputs through ReplayMonitor: the recorded samples, with the DHCP
+lease table and wifi client list scaled up to --leases and --clients. Then:
+
+  parse    parsers alone: series/s per command
+  collect  process_command into a fresh data dir: commands/s, series/s
+  history  --days of history at each tier's cadence through HistoryStore: samples/s,
+           files and bytes on disk vs. the one-text-file-per-run layout
+  scrape   /metrics through the exporter over that data dir: p50/p99 latency
+
+and finally the peak RSS of the whole run.
+
+    python benchmarks/bench_pipeline.py [--leases 2000] [--clients 300] [--days 7]
+"""
+import argparse
+import contextlib
+import io
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'collector'))
+sys.path.insert(0, os.path.join(HERE, '..', 'exporter'))
+import config
+
+TIER_INTERVALS = {**{c: 30 for c in config.COMMANDS_30_SEC}, **{c: 60 for c in config.COMMANDS_1_MIN}, **{c: 300 for c in config.COMMANDS_5_MIN}}
+
+def dhcp_output(leases):
+    rows = ["display dhcp server user all", "Index  Port   IP               HostName        MAC                Expire"]
+    for i in range(1, leases + 1):
+        rows.append(f"{i:<6} LAN{1 + i % 4:<3} 10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255:<4} host-{i:<10} "
+                    f"3c:22:{i >> 16 & 255:02x}:{i >> 8 & 255:02x}:{i & 255:02x}:10  {i % 2} days, {i % 24:02d}:{i % 60:02d}:{i * 7 % 60:02d}")
+    return "\n".join(rows + [f"Total: {leases}", "success!"])
+
+def wifi_associate_output(clients):
+    rows = ["display wifi associate"]
+    for band, count in (("2.4GHz", clients // 3), ("5GHz", clients - clients // 3)):
+        rows += [f"------------------- {band} -------------------", "MAC                SSID       Time     TxRate  RxRate  RSSI"]
+        for i in range(count):
+            n = i + (0 if band == "2.4GHz" else 4096)
+            rows.append(f"3C:22:FB:{n >> 8 & 255:02X}:{n & 255:02X}:20  HomeNet    {1000 + i * 37}    {(72, 286, 866)[i % 3]}M    {(24, 144, 433)[i % 3]}M    -{40 + i % 40}")
+    return "\n".join(rows + ["success!"])
+
+def load_outputs(leases, clients):
+    outputs = {}
+    samples_dir = os.path.join(HERE, 'samples')
+    for filename in os.listdir(samples_dir):
+        with open(os.path.join(samples_dir, filename), encoding='utf-8') as f:
+            text = f.read()
+        outputs[text.splitlines()[0].strip()] = text
+    outputs["display dhcp server user all"] = dhcp_output(leases)
+    outputs["display wifi associate"] = wifi_associate_output(clients)
+    return outputs
+
+def content_lines(output):
+    return [line for line in output.splitlines()[1:] if not line.lower().startswith('success!')]
+
+def stage_parse(outputs, parsers):
+    print("\n[parse]")
+    for command, output in outputs.items():
+        lines, prefix = content_lines(output), command.replace(' ', '_')
+        parser_func, labels = parsers.get_parser(command), {'command': prefix, 'port': 'unknown', 'device': 'bench'}
+        runs, series, start = 0, 0, time.perf_counter()
+        while time.perf_counter() - start < 0.3:
+            series += len(list(parser_func(lines, prefix, labels)))
+            runs += 1
+        elapsed = time.perf_counter() - start
+        print(f"  {command:<36}{len(lines):>7} lines{series // runs:>7} series{series / elapsed:>12.0f} series/s")
+
+def stage_collect(outputs, rounds):
+    import main
+    import state
+    from changes import ChangeTracker
+    from replay import ReplayMonitor
+    print("\n[collect]")
+    state.changes = ChangeTracker([])  # every round must do the full work
+    ont = ReplayMonitor(responses=outputs, name='bench')
+    series_before = sum(len(list(main.parsers.get_parser(c)(content_lines(o), c.replace(' ', '_'), {}))) for c, o in outputs.items())
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(rounds):
+            for command in outputs: main.process_command(command, ont)
+    elapsed = time.perf_counter() - start
+    commands = rounds * len(outputs)
+    print(f"  {commands} commands in {elapsed:.2f}s: {commands / elapsed:.0f} commands/s, {series_before * rounds / elapsed:.0f} series/s")
+
+def stage_history(outputs, parsers, data_dir, days):
+    from history import HistoryStore
+    from samples import render_lines
+    print("\n[history]")
+    store = HistoryStore(config.HISTORY_SEGMENT_SECONDS)
+    end = time.time()
+    samples = text_files = text_bytes = 0
+    start = time.perf_counter()
+    for command, output in outputs.items():
+        prefix, interval = command.replace(' ', '_'), TIER_INTERVALS.get(command, 300)
+        parsed = list(parsers.get_parser(command)(content_lines(output), prefix, {'command': prefix, 'port': 'unknown', 'device': 'bench'}))
+        runs = int(days * 86400 / interval)
+        for i in range(runs):
+            samples += store.append(os.path.join(data_dir, 'history', prefix), parsed, end - (runs - i) * interval)
+        text_files += runs
+        text_bytes += runs * len(render_lines(parsed).encode('utf-8'))
+    elapsed = time.perf_counter() - start
+    files = disk = 0
+    for root, _, names in os.walk(data_dir):
+        for name in names:
+            files += 1
+            disk += os.path.getsize(os.path.join(root, name))
+    print(f"  {samples} samples in {elapsed:.2f}s: {samples / elapsed:.0f} samples/s")
+    print(f"  on disk: {files} files, {disk / 1e6:.1f} MB (one text file per run would be {text_files} files, {text_bytes / 1e6:.1f} MB)")
+
+def stage_scrape(data_dir, scrapes):
+    import exporter
+    print("\n[scrape]")
+    exporter.DATA_DIR = data_dir
+    exporter.store = exporter.SnapshotStore(data_dir)
+    exporter.store.refresh()
+    httpd = exporter.PooledHTTPServer(('127.0.0.1', 0), exporter.MetricsHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_address[1]}/metrics"
+    latencies, size = [], 0
+    for _ in range(scrapes):
+        start = time.perf_counter()
+        with urllib.request.urlopen(url) as response: size = len(response.read())
+        latencies.append(time.perf_counter() - start)
+    httpd.shutdown()
+    httpd.server_close()
+    latencies.sort()
+    print(f"  {scrapes} scrapes of {size / 1e3:.0f} kB: p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+          f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--leases', type=int, default=2000, help="DHCP leases in 'display dhcp server user all'")
+    parser.add_argument('--clients', type=int, default=300, help="clients in 'display wifi associate'")
+    parser.add_argument('--days', type=float, default=7, help="length of the generated history")
+    parser.add_argument('--rounds', type=int, default=20, help="collection rounds over all commands")
+    parser.add_argument('--scrapes', type=int, default=200)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as data_dir:
+        config.CLEAN_DATA_DIR = data_dir
+        import parsers
+        outputs = load_outputs(args.leases, args.clients)
+        stage_parse(outputs, parsers)
+        stage_collect(outputs, args.rounds)
+        stage_history(outputs, parsers, data_dir, args.days)
+        stage_scrape(data_dir, args.scrapes)
+    print(f"\npeak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# benchmarks/bench_reconnect.py
+"""How quickly OntMonitor recovers after the device drops the SSH session.
+
+Connects to a local FakeOnt, then repeatedly kills the session from the server
+side and times how long the next run_command takes to succeed (liveness check,
+reconnect, prompt wait and the command itself).
+
+    python benchmarks/bench_reconnect.py [--rounds 10] [--idle 0]
+"""
+import argparse
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'collector'))
+from fake_ont import FakeOnt
+from ssh_manager import OntMonitor
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--idle', type=float, default=0.0, help="seconds to wait after the drop, so keepalives can notice it")
+    args = parser.parse_args()
+    server = FakeOnt().start()
+    ont = OntMonitor('127.0.0.1', server.port, 'root', server.password, name='fake', keepalive=1, reconnect_delay=0.2)
+    start = time.perf_counter()
+    ont.connect()
+    cold = time.perf_counter() - start
+    ont.run_command("wap top")
+    recoveries = []
+    for _ in range(args.rounds):
+        server.drop_connections()
+        time.sleep(args.idle)
+        start = time.perf_counter()
+        output = ont.run_command("wap top")
+        if "Mem:" not in output: raise SystemExit(f"Unexpected output after reconnect: {output!r}")
+        recoveries.append(time.perf_counter() - start)
+    ont.close()
+    server.stop()
+    recoveries.sort()
+    print(f"\ncold connect {cold * 1000:.0f} ms; recovery over {args.rounds} drops: "
+          f"median {recoveries[len(recoveries) // 2] * 1000:.0f} ms, max {recoveries[-1] * 1000:.0f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/bench_remote_write.py
+"""Remote-write throughput and outage recovery against a local receiver.
+
+Parses the recorded samples (DHCP leases and wifi clients scaled as in bench_pipeline)
+into one structured snapshot per command for each of --devices devices, then feeds
+--rounds collection rounds of them through RemoteWriter:
+
+  encode   cut_batches(): samples/s, batches and bytes per sample on disk
+  send     send_queued() to remote_write_receiver: samples/s and requests/s
+  outage   the receiver answers 503 for --outage-rounds rounds: queue depth while down,
+           then the time to drain it once it is back
+
+and checks that every (series, timestamp) arrived exactly once.
+
+    python benchmarks/bench_remote_write.py [--devices 4] [--rounds 10] [--batch-size 2000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'collector'))
+sys.path.insert(0, os.path.join(HERE, '..', 'exporter'))
+import parsers
+import remote_write
+import samples
+from bench_pipeline import content_lines, load_outputs
+from remote_write_receiver import RemoteWriteReceiver
+
+def build_snapshots(outputs, devices):
+    """[(device, command, families)] for every parsable command of every device."""
+    snapshots = []
+    for d in range(devices):
+        device = f"ont-{d}"
+        for command, text in outputs.items():
+            prefix = command.replace(' ', '_')
+            with contextlib.redirect_stdout(io.StringIO()):
+                parsed = list(parsers.get_parser(command)(content_lines(text), prefix, {'command': prefix, 'port': 'unknown', 'device': device}))
+            if parsed: snapshots.append((device, command, samples.group(parsed, parsers.metadata)))
+    return snapshots
+
+def add_rounds(writer, snapshots, first, rounds, interval=30):
+    total = 0
+    for r in range(first, first + rounds):
+        for _, _, families in snapshots:
+            writer.add({'timestamp': 1_700_000_000 + r * interval, 'families': families})
+            total += sum(len(rows) for *_, rows in families)
+    return total
+
+def queue_depth(writer):
+    queued = writer._queued()
+    size = sum(os.path.getsize(os.path.join(writer.queue_dir, f)) for f in queued)
+    return len(queued), sum(remote_write._batch_samples(f) for f in queued), size
+
+def send_all(writer):
+    writer.retry_at = 0
+    start = time.perf_counter()
+    while writer._queued():
+        before = writer.batches['retry']
+        writer.send_queued()
+        if writer.batches['retry'] != before: raise SystemExit("receiver refused a batch while up")
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=10, help="collection rounds pushed while the receiver is up")
+    parser.add_argument('--outage-rounds', type=int, default=10, help="collection rounds pushed while it answers 503")
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--leases', type=int, default=500, help="DHCP leases in 'display dhcp server user all'")
+    parser.add_argument('--clients', type=int, default=100, help="clients in 'display wifi associate'")
+    args = parser.parse_args()
+    snapshots = build_snapshots(load_outputs(args.leases, args.clients), args.devices)
+    per_round = sum(len(rows) for _, _, families in snapshots for *_, rows in families)
+    print(f"{len(snapshots)} snapshots, {per_round} samples per round; snappy: {'python-snappy' if remote_write.snappy else 'literal-only fallback'}")
+
+    receiver = RemoteWriteReceiver().start()
+    with tempfile.TemporaryDirectory() as queue_dir:
+        writer = remote_write.RemoteWriter(receiver.url, queue_dir, interval=0.01, batch_size=args.batch_size, max_queue_bytes=1 << 40)
+
+        total = add_rounds(writer, snapshots, 0, args.rounds)
+        start = time.perf_counter()
+        writer.cut_batches()
+        elapsed = time.perf_counter() - start
+        batches, _, size = queue_depth(writer)
+        print(f"\nencode  {total} samples in {elapsed:.2f}s: {total / elapsed:,.0f} samples/s, "
+              f"{batches} batches, {size / total:.1f} bytes/sample")
+
+        elapsed = send_all(writer)
+        print(f"send    {total / elapsed:,.0f} samples/s, {receiver.requests / elapsed:,.0f} requests/s, "
+              f"{receiver.bytes / receiver.requests / 1024:.0f} KiB per request")
+
+        receiver.down = True
+        outage = add_rounds(writer, snapshots, args.rounds, args.outage_rounds)
+        for _ in range(args.outage_rounds):
+            writer.cut_batches()
+            writer.retry_at = 0
+            writer.send_queued()
+        batches, queued, size = queue_depth(writer)
+        print(f"outage  {writer.batches['retry']} refused requests; queued {batches} batches, {queued} samples, "
+              f"{size / (1 << 20):.1f} MiB; backoff now {writer.backoff:.2f}s")
+
+        receiver.down = False
+        elapsed = send_all(writer)
+        print(f"drain   {queued} samples in {elapsed:.2f}s after recovery: {queued / elapsed:,.0f} samples/s")
+
+    receiver.stop()
+    expected = total + outage
+    ok = receiver.samples == expected == len(receiver.seen) and writer.samples_sent == expected
+    print(f"\nreceived {receiver.samples} samples, {len(receiver.seen)} distinct (series, timestamp), expected {expected}: "
+          f"{'OK' if ok else 'MISMATCH'}")
+    if not ok: sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/bench_scrape_load.py
+"""Scrape latency of the exporter under concurrent load.
+
+Serves a throwaway data directory through PooledHTTPServer and lets N scrapers
+hit /metrics over keep-alive connections while a few stalled clients hold
+connections open without sending a request, then reports p50/p99 latency.
+
+    python benchmarks/bench_scrape_load.py [--scrapers 8] [--scrapes 200] [--stalled 2]
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'exporter'))
+import exporter
+
+def build_data_dir(root, commands=9, series=200):
+    for c in range(commands):
+        command_dir = os.path.join(root, f"command_{c}")
+        os.makedirs(command_dir)
+        name, rows = f'command_{c}_metric', [[f'{{index="{i}",port="unknown"}}', i] for i in range(series)]
+        with open(os.path.join(command_dir, exporter.LATEST_FILENAME), 'w') as f:
+            json.dump({'timestamp': time.time(), 'families': [[name, 'gauge', 'Benchmark series.', rows]]}, f)
+
+def scraper(port, scrapes, gzip, openmetrics, latencies):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    headers = {'Accept-Encoding': 'gzip'} if gzip else {}
+    if openmetrics: headers['Accept'] = 'application/openmetrics-text; version=1.0.0'
+    for _ in range(scrapes):
+        start = time.perf_counter()
+        conn.request('GET', '/metrics', headers=headers)
+        conn.getresponse().read()
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scrapers', type=int, default=8, help="concurrent keep-alive scrapers")
+    parser.add_argument('--scrapes', type=int, default=200, help="scrapes per scraper")
+    parser.add_argument('--stalled', type=int, default=2, help="clients that connect and never send a request")
+    parser.add_argument('--workers', type=int, default=exporter.WORKERS)
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--openmetrics', action='store_true', help="ask for OpenMetrics instead of the text format")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as root:
+        build_data_dir(root)
+        exporter.DATA_DIR = root
+        exporter.store = exporter.SnapshotStore(root)
+        exporter.store.refresh()
+        httpd = exporter.PooledHTTPServer(('127.0.0.1', 0), exporter.MetricsHandler, workers=args.workers)
+        port = httpd.server_address[1]
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        stalled = [socket.create_connection(('127.0.0.1', port)) for _ in range(args.stalled)]
+        latencies = []
+        threads = [threading.Thread(target=scraper, args=(port, args.scrapes, args.gzip, args.openmetrics, latencies)) for _ in range(args.scrapers)]
+        start = time.perf_counter()
+        for t in threads: t.start()
+        for t in threads: t.join()
+        elapsed = time.perf_counter() - start
+        for s in stalled: s.close()
+        httpd.shutdown()
+        httpd.server_close()
+    latencies.sort()
+    print(f"{len(latencies)} scrapes from {args.scrapers} scrapers ({args.stalled} stalled clients, {args.workers} workers) in {elapsed:.2f}s")
+    print(f"p50 {percentile(latencies, 0.50) * 1000:.2f} ms   p99 {percentile(latencies, 0.99) * 1000:.2f} ms   "
+          f"max {latencies[-1] * 1000:.2f} ms   {len(latencies) / elapsed:.0f} scrapes/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_startup.py
+"""Cold start of the collector: time to scheduler start and to the first snapshot.
+
+Starts the collector's real entry point (main.py) as a fresh process, replaying
+benchmarks/samples for --devices devices into a scratch data directory, and reads the
+two times it reports itself: when the scheduler started (imports, config, device pool)
+and when the first snapshot was written. Each --runs is a new process, for
+STARTUP_MODE=immediate and STARTUP_MODE=staggered (with STARTUP_JITTER=--jitter).
+--preload-paramiko imports paramiko before main.py, the way every start did when
+ssh_manager imported it eagerly.
+
+    python benchmarks/bench_startup.py [--runs 5] [--devices 1] [--jitter 5]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COLLECTOR = os.path.join(HERE, '..', 'collector')
+
+LAUNCHER = """
+import runpy, sys
+sys.path.insert(0, sys.argv[1])
+if sys.argv[3] == '1': import paramiko
+import config
+config.CLEAN_DATA_DIR = sys.argv[2]
+runpy.run_path(sys.argv[1] + '/main.py', run_name='__main__')
+"""
+
+def start_once(mode, devices, jitter, preload, timeout=60):
+    """(seconds to scheduler start, seconds to first snapshot) as reported by the collector."""
+    with tempfile.TemporaryDirectory() as scratch:
+        replay_dir, data_dir = os.path.join(scratch, 'replay'), os.path.join(scratch, 'data')
+        os.makedirs(replay_dir)
+        aliases = [f"ont-{d}" for d in range(devices)]
+        for alias in aliases: os.symlink(os.path.join(HERE, 'samples'), os.path.join(replay_dir, alias))
+        env = dict(os.environ, PYTHONUNBUFFERED='1', REPLAY_DIR=replay_dir, SSH_HOST_ALIASES=','.join(aliases),
+                   STARTUP_MODE=mode, STARTUP_JITTER=str(jitter))
+        process = subprocess.Popen([sys.executable, '-c', LAUNCHER, COLLECTOR, data_dir, '1' if preload else '0'],
+                                   env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        ready = None
+        deadline = time.monotonic() + timeout
+        try:
+            for line in process.stdout:
+                match = re.search(r"Started in ([\d.]+)s", line)
+                if match: ready = float(match.group(1))
+                match = re.search(r"First snapshot written ([\d.]+)s", line)
+                if match: return ready, float(match.group(1))
+                if time.monotonic() > deadline: break
+            raise SystemExit(f"No snapshot within {timeout}s (exit code {process.poll()}).")
+        finally:
+            process.kill()
+            process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--devices', type=int, default=1)
+    parser.add_argument('--jitter', type=float, default=5, help="STARTUP_JITTER for the staggered runs")
+    parser.add_argument('--preload-paramiko', action='store_true')
+    args = parser.parse_args()
+    for mode in ('immediate', 'staggered'):
+        results = [start_once(mode, args.devices, args.jitter, args.preload_paramiko) for _ in range(args.runs)]
+        ready, first = [r for r, _ in results], [f for _, f in results]
+        print(f"{mode:<10} scheduler started: median {statistics.median(ready):.2f}s   "
+              f"first snapshot: median {statistics.median(first):.2f}s, min {min(first):.2f}s, max {max(first):.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/fake_ont.py
+"""A local paramiko SSH server that behaves like the ONT's CLI.
+
+It prints a banner and a `WAP>` prompt, echoes what is typed and answers every
+command with the matching recording from benchmarks/samples/ (optionally after a
+delay). drop_connections() kills all sessions from the server side, the way the
+ONT does when it reboots or times a session out.
+
+    python benchmarks/fake_ont.py [--port 2222] [--latency 0.2]
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+import paramiko
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'samples')
+
+def load_responses(samples_dir=SAMPLES_DIR):
+    """{command: reply body} from recorded outputs, whose first line is the command echo."""
+    responses = {}
+    for filename in os.listdir(samples_dir):
+        if not filename.endswith('.txt'): continue
+        with open(os.path.join(samples_dir, filename), encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        responses[lines[0].strip()] = "\r\n".join(lines[1:])
+    return responses
+
+class _Server(paramiko.ServerInterface):
+    def __init__(self, password):
+        self.password = password
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL if password == self.password else paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED if kind == 'session' else paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, *args):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        return True
+
+class FakeOnt:
+    def __init__(self, port=0, password='admin', prompt='WAP>', latency=0.0, responses=None):
+        self.password, self.prompt, self.latency = password, prompt, latency
+        self.responses = load_responses() if responses is None else responses
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', port))
+        self.sock.listen(16)
+        self.port = self.sock.getsockname()[1]
+        self.transports = []
+        self.running = False
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.drop_connections()
+        self.sock.close()
+
+    def drop_connections(self):
+        for transport in self.transports: transport.close()
+        self.transports = []
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                client, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client):
+        transport = paramiko.Transport(client)
+        transport.add_server_key(self.host_key)
+        self.transports.append(transport)
+        try:
+            transport.start_server(server=_Server(self.password))
+            channel = transport.accept(10)
+            if channel is None: return
+            channel.send(f"\r\nWAP(Dopra Linux) # fake ONT\r\n{self.prompt}")
+            typed = ""
+            while True:
+                data = channel.recv(1024)
+                if not data: return
+                text = data.decode('utf-8', errors='ignore')
+                channel.send(text.replace('\n', '\r\n'))
+                typed += text
+                while '\n' in typed:
+                    command, typed = typed.split('\n', 1)
+                    command = command.strip('\r ').strip()
+                    if self.latency: time.sleep(self.latency)
+                    reply = self.responses.get(command, f"Unknown command: {command}") if command else ""
+                    channel.sendall((reply + "\r\n" if reply else "") + self.prompt)
+        except Exception:
+            pass
+        finally:
+            transport.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=2222)
+    parser.add_argument('--password', default='admin')
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds before answering each command")
+    args = parser.parse_args()
+    server = FakeOnt(args.port, args.password, latency=args.latency).start()
+    print(f"Fake ONT listening on 127.0.0.1:{server.port} (password '{args.password}')")
+    try:
+        while True: time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == '__main__':
+    main()
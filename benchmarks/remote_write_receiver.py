@@ -0,0 +1,151 @@
+# benchmarks/remote_write_receiver.py
+"""A local stand-in for a Prometheus remote-write endpoint.
+
+Accepts POSTs of snappy-compressed WriteRequest protobufs on /api/v1/write, decodes
+them without any third-party package and keeps what arrived: request, series and
+sample counts plus every (series, timestamp) seen. Setting `down` makes it answer
+503, the way an unavailable Prometheus does, so retry and queueing can be tested.
+
+    python benchmarks/remote_write_receiver.py [--port 9201]
+"""
+import argparse
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def _varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80: return result, pos
+        shift += 7
+
+def snappy_decompress(buf):
+    """Decodes a snappy block (literals and all three copy element kinds)."""
+    length, pos = _varint(buf, 0)
+    out = bytearray()
+    while pos < len(buf):
+        tag = buf[pos]
+        pos += 1
+        kind = tag & 3
+        if kind == 0:
+            n = tag >> 2
+            if n >= 60:
+                extra = n - 59
+                n = int.from_bytes(buf[pos:pos + extra], 'little')
+                pos += extra
+            out += buf[pos:pos + n + 1]
+            pos += n + 1
+            continue
+        if kind == 1:
+            n, offset = ((tag >> 2) & 7) + 4, (tag >> 5) << 8 | buf[pos]
+            pos += 1
+        elif kind == 2:
+            n, offset = (tag >> 2) + 1, int.from_bytes(buf[pos:pos + 2], 'little')
+            pos += 2
+        else:
+            n, offset = (tag >> 2) + 1, int.from_bytes(buf[pos:pos + 4], 'little')
+            pos += 4
+        for _ in range(n): out.append(out[-offset])
+    if len(out) != length: raise ValueError(f"snappy block decoded to {len(out)} bytes, expected {length}")
+    return bytes(out)
+
+def _fields(buf):
+    """Yields (field number, wire type, value) of a protobuf message."""
+    pos = 0
+    while pos < len(buf):
+        key, pos = _varint(buf, pos)
+        number, wire = key >> 3, key & 7
+        if wire == 0:
+            value, pos = _varint(buf, pos)
+        elif wire == 1:
+            value, pos = buf[pos:pos + 8], pos + 8
+        elif wire == 2:
+            n, pos = _varint(buf, pos)
+            value, pos = buf[pos:pos + n], pos + n
+        else:
+            raise ValueError(f"unsupported wire type {wire}")
+        yield number, wire, value
+
+def decode_write_request(buf):
+    """[(labels dict, [(value, timestamp ms), ...]), ...] from a WriteRequest."""
+    series = []
+    for number, _, timeseries in _fields(buf):
+        if number != 1: continue
+        labels, samples = {}, []
+        for field, _, value in _fields(timeseries):
+            if field == 1:
+                label = {n: v.decode('utf-8') for n, _, v in _fields(value)}
+                labels[label.get(1, '')] = label.get(2, '')
+            elif field == 2:
+                sample = {n: v for n, _, v in _fields(value)}
+                samples.append((struct.unpack('<d', sample[1])[0] if 1 in sample else 0.0, sample.get(2, 0)))
+        series.append((labels, samples))
+    return series
+
+class RemoteWriteReceiver:
+    def __init__(self, port=0):
+        self.down = False
+        self.requests = self.series = self.samples = self.bytes = 0
+        self.seen = set()
+        self.lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if receiver.down:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                try:
+                    series = decode_write_request(snappy_decompress(body))
+                except Exception as e:
+                    self.send_response(400)
+                    self.end_headers()
+                    self.wfile.write(str(e).encode())
+                    return
+                with receiver.lock:
+                    receiver.requests += 1
+                    receiver.bytes += len(body)
+                    receiver.series += len(series)
+                    for labels, samples in series:
+                        key = tuple(sorted(labels.items()))
+                        receiver.samples += len(samples)
+                        receiver.seen.update((key, timestamp) for _, timestamp in samples)
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                return
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.port = self.httpd.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}/api/v1/write"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=9201)
+    args = parser.parse_args()
+    receiver = RemoteWriteReceiver(args.port).start()
+    print(f"Remote-write receiver listening on {receiver.url}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"{receiver.requests} requests, {receiver.series} series, {receiver.samples} samples, {receiver.bytes} bytes")
+    except KeyboardInterrupt:
+        receiver.stop()
+
+if __name__ == '__main__':
+    main()
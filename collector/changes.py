@@ -0,0 +1,46 @@
+# collector/changes.py
+import hashlib
+
+class ChangeTracker:
+    """Remembers a digest of each (device, command) output so unchanged outputs can skip
+    storage, and backs the polling rate off while an output stays stable. `families` keeps
+    the last snapshot families of each output, rewritten with a fresh timestamp while the
+    output stays the same.
+
+    After every unchanged run the command's poll multiplier doubles (up to
+    `max_multiplier`) and that many ticks minus one are skipped; any change resets it
+    to 1, i.e. the tier's configured rate. `max_multiplier=1` disables the back-off.
+    """
+    def __init__(self, commands, max_multiplier=1):
+        self.commands = set(commands)
+        self.max_multiplier = max_multiplier
+        self.digests, self.multipliers, self.skips = {}, {}, {}
+        self.families = {}
+
+    def tracks(self, command):
+        return command in self.commands
+
+    def should_run(self, device, command):
+        key = (device, command)
+        if self.skips.get(key, 0) > 0:
+            self.skips[key] -= 1
+            return False
+        return True
+
+    @staticmethod
+    def hasher():
+        """A fresh digest for one run's output, fed line by line before it is parsed."""
+        return hashlib.blake2b(digest_size=16)
+
+    def observe(self, device, command, digest):
+        """Records this run's output digest; returns True if it differs from the previous one."""
+        key = (device, command)
+        changed = self.digests.get(key) != digest
+        self.digests[key] = digest
+        multiplier = 1 if changed else min(self.multipliers.get(key, 1) * 2, self.max_multiplier)
+        self.multipliers[key] = multiplier
+        self.skips[key] = multiplier - 1
+        return changed
+
+    def multiplier(self, device, command):
+        return self.multipliers.get((device, command), 1)
@@ -6,20 +6,93 @@ import os
 # The alias for your router from your ~/.ssh/config file
 SSH_HOST_ALIAS = os.getenv("SSH_HOST_ALIAS", "ont.home")
 
-# The SSH password for your router
+# Comma-separated aliases to poll when monitoring several ONTs. Each alias also
+# becomes the `device` label and its data directory. Defaults to SSH_HOST_ALIAS.
+SSH_HOST_ALIASES = [a.strip() for a in os.getenv("SSH_HOST_ALIASES", SSH_HOST_ALIAS).split(",") if a.strip()]
+
+# How many devices are polled at the same time.
+MAX_PARALLEL_DEVICES = int(os.getenv("MAX_PARALLEL_DEVICES", "8"))
+
+# The SSH password for your router (shared by all devices)
 PASSWORD = os.getenv("ONT_PASSWORD")
 
 # The final output directory that the Prometheus exporter will read from.
 # This path is INSIDE the container. Docker will map it to the host.
 CLEAN_DATA_DIR = '/data'
 
+# Every command directory also keeps its most recent samples under this name, as a
+# structured (JSON) snapshot replaced atomically on each run; the exporter merges
+# and encodes them, so it never has to search for or re-parse anything.
+LATEST_FILENAME = 'latest.json'
+
+# How long to wait for a command to return to the CLI prompt, in seconds.
+COMMAND_TIMEOUT = float(os.getenv("COMMAND_TIMEOUT", "30"))
+
+# Seconds between SSH keepalive packets, so a dead session is noticed between jobs.
+SSH_KEEPALIVE = int(os.getenv("SSH_KEEPALIVE", "15"))
+
+# Connection attempts per job when the session has dropped; retries back off
+# exponentially (with jitter) starting at SSH_RECONNECT_DELAY seconds.
+SSH_RECONNECT_ATTEMPTS = int(os.getenv("SSH_RECONNECT_ATTEMPTS", "3"))
+SSH_RECONNECT_DELAY = float(os.getenv("SSH_RECONNECT_DELAY", "0.5"))
+
+# Development aids: RECORD_DIR saves every raw command output under
+# <RECORD_DIR>/<device>/<command>/; REPLAY_DIR runs the collector without any SSH,
+# replaying <REPLAY_DIR>/<device>/<command>/*.txt with REPLAY_LATENCY seconds per command.
+RECORD_DIR = os.getenv("RECORD_DIR")
+REPLAY_DIR = os.getenv("REPLAY_DIR")
+REPLAY_LATENCY = float(os.getenv("REPLAY_LATENCY", "0"))
+
+# Send each job's commands back-to-back over the shell and split the replies on the
+# prompt, instead of waiting for every command before sending the next one.
+PIPELINE_COMMANDS = os.getenv("PIPELINE_COMMANDS", "false").lower() in ("1", "true", "yes")
+
+# Where each run's parsed samples are kept: 'segments' appends them to one compact
+# segment file per command and time window, 'text' writes one .txt file per run.
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "segments")
+
+# Time window covered by one history segment, in seconds. Retention drops whole segments.
+HISTORY_SEGMENT_SECONDS = int(os.getenv("HISTORY_SEGMENT_SECONDS", "3600"))
+
+# Directory under CLEAN_DATA_DIR for the collector's own metrics (scheduler lag,
+# overruns, ...). Served by the exporter like any other command.
+COLLECTOR_METRICS_DIR = '_collector'
+
+# Commands whose output is hashed each run: when nothing changed, parsing and storage
+# are skipped and only the snapshot timestamp is refreshed. Comma-separated; defaults
+# to the slow-changing 5-minute inventory commands.
+CHANGE_ONLY_COMMANDS = [c.strip() for c in os.getenv("CHANGE_ONLY_COMMANDS", ",".join([
+    "display deviceinfo",
+    "display lanport workmode",
+    "display wifi information",
+    "display waninfo all detail",
+    "display dhcp server user all",
+])).split(",") if c.strip()]
+
+# While a change-only command's output stays the same, poll it up to this many times
+# less often (doubling after every unchanged run); 1 keeps the configured rate.
+ADAPTIVE_MAX_MULTIPLIER = int(os.getenv("ADAPTIVE_MAX_MULTIPLIER", "1"))
+
 # How long to keep the parsed data files. Loaded from environment.
 # Format: '7d', '48h', etc. Defaults to 7 days.
 CLEANUP_OLDER_THAN = os.getenv("CLEANUP_OLDER_THAN", "7d")
 
-# How often to run the cleanup job. Defaults to every 1 day.
+# How often to rescan the whole data directory for files the collector did not
+# write itself (e.g. from before a restart). Defaults to every 1 day.
 CLEANUP_FREQUENCY = os.getenv("CLEANUP_FREQUENCY", "1d")
 
+# Expired data is deleted in small slices: one every RETENTION_SLICE_INTERVAL
+# seconds, each allowed to run for at most RETENTION_SLICE_BUDGET seconds.
+RETENTION_SLICE_INTERVAL = int(os.getenv("RETENTION_SLICE_INTERVAL", "10"))
+RETENTION_SLICE_BUDGET = float(os.getenv("RETENTION_SLICE_BUDGET", "0.05"))
+
+# How each tier's first run is scheduled at startup. 'immediate' runs every tier right
+# away. 'staggered' spreads the first run of each collection tier randomly over up to
+# STARTUP_JITTER seconds (never more than the tier's interval) and starts retention only
+# after that window, so collectors restarting together do not send every command at once.
+STARTUP_MODE = os.getenv("STARTUP_MODE", "immediate")
+STARTUP_JITTER = float(os.getenv("STARTUP_JITTER", "10"))
+
 
 # --- Command Scheduling ---
 COMMANDS_30_SEC = [
@@ -0,0 +1,152 @@
+# collector/history.py
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+SEGMENT_SUFFIX = '.seg'
+SERIES_SUFFIX = '.series'
+MAGIC = b'ONTHIST1'
+_BLOCK_HEADER = struct.Struct('<dI')
+
+class HistoryStore:
+    """Appends every run's samples to one segment file per command instead of one text file per run.
+
+    A segment covers `segment_seconds` of wall time and is a pair of files named after
+    its start time:
+      <start>.series  one series key (`name{labels}`) per line; the line number is its id
+      <start>.seg     MAGIC, then one block per run: float64 timestamp, uint32 count,
+                      count uint32 series ids, count float64 values (all little-endian)
+    Segments are self-contained, so retention just deletes whole pairs.
+    """
+    def __init__(self, segment_seconds=3600, on_new_segment=None):
+        self.segment_seconds = segment_seconds
+        self.on_new_segment = on_new_segment
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def _segment_start(self, timestamp):
+        return int(timestamp // self.segment_seconds * self.segment_seconds)
+
+    def _series_ids(self, command_dir, start):
+        """Returns the in-memory id table of the command's current segment, reloading it after a restart."""
+        cached = self.series.get(command_dir)
+        if cached and cached[0] == start: return cached[1]
+        ids = {}
+        series_path = command_dir / f"{start}{SERIES_SUFFIX}"
+        if series_path.exists():
+            with open(series_path, 'r', encoding='utf-8') as f:
+                for line in f: ids[line.rstrip('\n')] = len(ids)
+            _truncate_torn_block(command_dir / f"{start}{SEGMENT_SUFFIX}")
+        self.series[command_dir] = (start, ids)
+        return ids
+
+    def append(self, command_dir, samples, timestamp=None):
+        """Stores one run's samples (see samples.Sample); returns the number of samples written."""
+        timestamp = time.time() if timestamp is None else timestamp
+        command_dir = Path(command_dir)
+        ids, values = [], []
+        with self.lock:
+            start = self._segment_start(timestamp)
+            series_ids = self._series_ids(command_dir, start)
+            new_keys = []
+            for sample in samples:
+                key = sample.name + sample.labels
+                series_id = series_ids.get(key)
+                if series_id is None:
+                    series_id = series_ids[key] = len(series_ids)
+                    new_keys.append(key)
+                ids.append(series_id)
+                values.append(sample.value)
+            if not ids: return 0
+            command_dir.mkdir(parents=True, exist_ok=True)
+            if new_keys:
+                with open(command_dir / f"{start}{SERIES_SUFFIX}", 'a', encoding='utf-8') as f:
+                    f.write(''.join(key + '\n' for key in new_keys))
+            segment_path = command_dir / f"{start}{SEGMENT_SUFFIX}"
+            count = len(ids)
+            block = _BLOCK_HEADER.pack(timestamp, count) + struct.pack(f'<{count}I', *ids) + struct.pack(f'<{count}d', *values)
+            with open(segment_path, 'ab') as f:
+                created = f.tell() == 0
+                if created: f.write(MAGIC)
+                f.write(block)
+        if created and self.on_new_segment: self.on_new_segment(command_dir, start)
+        return count
+
+    def segments(self, command_dir):
+        """Segment start times of a command directory, oldest first."""
+        try:
+            names = os.listdir(command_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(int(n[:-len(SEGMENT_SUFFIX)]) for n in names if n.endswith(SEGMENT_SUFFIX) and n[:-len(SEGMENT_SUFFIX)].isdigit())
+
+    def read(self, command_dir, since=0):
+        """Yields (timestamp, [(series key, value), ...]) for every stored run at or after `since`."""
+        command_dir = Path(command_dir)
+        for start in self.segments(command_dir):
+            if start + self.segment_seconds <= since: continue
+            with open(command_dir / f"{start}{SERIES_SUFFIX}", 'r', encoding='utf-8') as f:
+                keys = [line.rstrip('\n') for line in f]
+            for timestamp, ids, values in read_segment(command_dir / f"{start}{SEGMENT_SUFFIX}"):
+                if timestamp >= since:
+                    yield timestamp, [(keys[i], v) for i, v in zip(ids, values) if i < len(keys)]
+
+    def drop_segment(self, command_dir, start):
+        """Deletes one segment pair; returns (files, bytes) removed."""
+        command_dir = Path(command_dir)
+        files = freed = 0
+        with self.lock:
+            cached = self.series.get(command_dir)
+            if cached and cached[0] == start: del self.series[command_dir]
+            for suffix in (SEGMENT_SUFFIX, SERIES_SUFFIX):
+                path = command_dir / f"{start}{suffix}"
+                try:
+                    freed += path.stat().st_size
+                    path.unlink()
+                    files += 1
+                except FileNotFoundError:
+                    pass
+        return files, freed
+
+    def drop_older_than(self, command_dir, cutoff):
+        """Deletes whole segments that ended before `cutoff`; returns (files, bytes) removed."""
+        files = freed = 0
+        for start in self.segments(command_dir):
+            if start + self.segment_seconds > cutoff: break
+            dropped, dropped_bytes = self.drop_segment(command_dir, start)
+            files, freed = files + dropped, freed + dropped_bytes
+        return files, freed
+
+def _iter_blocks(buf):
+    """Yields (offset, timestamp, count) for each complete block; a torn final block is ignored."""
+    offset, size = len(MAGIC), len(buf)
+    while offset + _BLOCK_HEADER.size <= size:
+        timestamp, count = _BLOCK_HEADER.unpack_from(buf, offset)
+        if offset + _BLOCK_HEADER.size + count * 12 > size: return
+        yield offset + _BLOCK_HEADER.size, timestamp, count
+        offset += _BLOCK_HEADER.size + count * 12
+
+def read_segment(path):
+    """Yields (timestamp, ids, values) blocks from a memory-mapped segment."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size <= len(MAGIC): return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            if buf[:len(MAGIC)] != MAGIC: raise ValueError(f"{path} is not a history segment")
+            for offset, timestamp, count in _iter_blocks(buf):
+                yield timestamp, struct.unpack_from(f'<{count}I', buf, offset), struct.unpack_from(f'<{count}d', buf, offset + count * 4)
+
+def _truncate_torn_block(path):
+    """Cuts off a block left half-written by a crash so new blocks append to a clean boundary."""
+    try:
+        with open(path, 'r+b') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= len(MAGIC): return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                end = len(MAGIC)
+                for offset, _, count in _iter_blocks(buf): end = offset + count * 12
+            if end < size: f.truncate(end)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,126 @@
+# collector/instrumentation.py
+import os
+import threading
+import time
+from pathlib import Path
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+import config
+import samples
+
+# The collector's own metrics; `command` labels use the same underscored form as the data. They are written next to the command snapshots as
+# <CLEAN_DATA_DIR>/<COLLECTOR_METRICS_DIR>/metrics/latest.json and served by the exporter.
+REGISTRY = CollectorRegistry()
+
+SSH_COMMAND_SECONDS = Histogram('collector_ssh_command_seconds', 'Time from sending a command until the prompt returned.',
+                                ['device', 'command'], buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 20, 30, 60), registry=REGISTRY)
+SSH_RECEIVED_BYTES = Counter('collector_ssh_received_bytes', 'Bytes read from the device shell.', ['device', 'command'], registry=REGISTRY)
+SSH_COMMAND_TIMEOUTS = Counter('collector_ssh_command_timeouts', 'Commands that did not return to the prompt in time.', ['device', 'command'], registry=REGISTRY)
+SSH_CONNECTS = Counter('collector_ssh_connects', 'SSH connection attempts by result.', ['device', 'result'], registry=REGISTRY)
+PARSE_SECONDS = Histogram('collector_parse_seconds', 'Time spent parsing one command output.', ['command'],
+                          buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25), registry=REGISTRY)
+PARSE_FAILURES = Counter('collector_parse_failures', 'Command outputs that raised or produced no series.', ['device', 'command', 'reason'], registry=REGISTRY)
+SERIES = Gauge('collector_series', 'Series produced by the last run of a command.', ['device', 'command'], registry=REGISTRY)
+SNAPSHOT_TIMESTAMP = Gauge('collector_snapshot_timestamp_seconds', 'When the latest snapshot of a command was written.', ['device', 'command'], registry=REGISTRY)
+UNCHANGED_OUTPUTS = Counter('collector_unchanged_outputs', 'Runs skipped for parsing and storage because the output did not change.', ['device', 'command'], registry=REGISTRY)
+POLL_MULTIPLIER = Gauge('collector_poll_multiplier', 'How many times less often than its tier a command is currently polled.', ['device', 'command'], registry=REGISTRY)
+JOB_SECONDS = Histogram('collector_job_seconds', 'Duration of one run of a scheduler tier.', ['tier'],
+                        buckets=(0.1, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300), registry=REGISTRY)
+TIER_INTERVAL = Gauge('collector_tier_interval_seconds', 'Configured interval of a scheduler tier.', ['tier'], registry=REGISTRY)
+TIER_RUNS = Counter('collector_tier_runs', 'Completed runs of a scheduler tier.', ['tier'], registry=REGISTRY)
+TIER_OVERRUNS = Counter('collector_tier_overruns', 'Runs that took longer than the tier interval.', ['tier'], registry=REGISTRY)
+TIER_SKIPPED = Counter('collector_tier_skipped_ticks', 'Ticks skipped because the previous run was still going or late.', ['tier'], registry=REGISTRY)
+TIER_LAG = Gauge('collector_tier_last_start_lag_seconds', 'How late the last run of a tier started.', ['tier'], registry=REGISTRY)
+RETENTION_FILES = Gauge('collector_retention_reclaimed_files', 'Files deleted by retention since start.', registry=REGISTRY)
+RETENTION_BYTES = Gauge('collector_retention_reclaimed_bytes', 'Bytes deleted by retention since start.', registry=REGISTRY)
+RETENTION_SECONDS = Gauge('collector_retention_seconds', 'Time spent in retention slices since start.', registry=REGISTRY)
+STARTUP_SECONDS = Gauge('collector_startup_seconds', 'Time from process start until the scheduler started (phase="ready") and until the first snapshot was written (phase="first_sample").', ['phase'], registry=REGISTRY)
+
+_imported_at = time.monotonic()
+_first_sample_lock = threading.Lock()
+_first_sample_written = False
+
+def process_uptime():
+    """Seconds since the process was started, interpreter start-up and imports included. Read
+    from /proc on Linux; elsewhere it counts from when this module was imported."""
+    try:
+        with open('/proc/self/stat') as f: started_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f: uptime = float(f.read().split()[0])
+        return uptime - started_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - _imported_at
+
+def record_startup(phase):
+    seconds = process_uptime()
+    STARTUP_SECONDS.labels(phase).set(seconds)
+    return seconds
+
+def record_command(device, stats):
+    command = stats['command'].replace(' ', '_')
+    SSH_COMMAND_SECONDS.labels(device, command).observe(stats['latency'])
+    SSH_RECEIVED_BYTES.labels(device, command).inc(stats['bytes'])
+    if stats['timed_out']: SSH_COMMAND_TIMEOUTS.labels(device, command).inc()
+
+def record_connect(device, success):
+    SSH_CONNECTS.labels(device, 'success' if success else 'failure').inc()
+
+def record_parse(device, command, seconds, series):
+    PARSE_SECONDS.labels(command).observe(seconds)
+    SERIES.labels(device, command).set(series)
+    if not series: PARSE_FAILURES.labels(device, command, 'empty').inc()
+
+def record_parse_failure(device, command):
+    PARSE_FAILURES.labels(device, command, 'error').inc()
+
+def record_change(device, command, changed, multiplier):
+    if not changed: UNCHANGED_OUTPUTS.labels(device, command).inc()
+    POLL_MULTIPLIER.labels(device, command).set(multiplier)
+
+def record_snapshot(device, command):
+    SNAPSHOT_TIMESTAMP.labels(device, command).set(time.time())
+    global _first_sample_written
+    if _first_sample_written: return
+    with _first_sample_lock:
+        if _first_sample_written: return
+        _first_sample_written = True
+    print(f"First snapshot written {record_startup('first_sample'):.2f}s after the collector started.")
+
+def record_tier_run(tier):
+    TIER_INTERVAL.labels(tier.name).set(tier.interval)
+    JOB_SECONDS.labels(tier.name).observe(tier.last_duration)
+    TIER_RUNS.labels(tier.name).inc()
+    TIER_LAG.labels(tier.name).set(tier.last_lag)
+    if tier.last_duration > tier.interval: TIER_OVERRUNS.labels(tier.name).inc()
+
+def record_tier_skipped(tier, ticks):
+    TIER_SKIPPED.labels(tier.name).inc(ticks)
+
+class _LabelCacheCollector:
+    """Reads the label-set cache's counters when the registry is collected; hits and misses
+    only ever grow, so they are exported as counters."""
+    def __init__(self, cache_info):
+        self.cache_info = cache_info
+
+    def collect(self):
+        info = self.cache_info()
+        yield CounterMetricFamily('collector_label_cache_hits', 'Label sets found in the label-set cache.', value=info.hits)
+        yield CounterMetricFamily('collector_label_cache_misses', 'Label sets formatted because they were not cached.', value=info.misses)
+        yield GaugeMetricFamily('collector_label_cache_size', 'Label sets currently in the label-set cache.', value=info.currsize)
+
+def watch_label_cache(cache_info):
+    REGISTRY.register(_LabelCacheCollector(cache_info))
+
+def watch_retention(engine):
+    RETENTION_FILES.set_function(lambda: engine.files_reclaimed)
+    RETENTION_BYTES.set_function(lambda: engine.bytes_reclaimed)
+    RETENTION_SECONDS.set_function(lambda: engine.seconds_spent)
+
+def flush():
+    """Writes the registry atomically, as the same structured snapshot the commands get, for the exporter to pick up."""
+    output_dir = Path(config.CLEAN_DATA_DIR) / config.COLLECTOR_METRICS_DIR / 'metrics'
+    output_dir.mkdir(parents=True, exist_ok=True)
+    families = []
+    for metric in REGISTRY.collect():
+        rows = [[samples.format_labels(s.labels), s.value, s.name[len(metric.name):]] for s in metric.samples if not s.name.endswith('_created')]
+        families.append((metric.name, metric.type, metric.documentation, rows))
+    samples.write_snapshot(output_dir / config.LATEST_FILENAME, families, time.time())
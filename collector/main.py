@@ -1,59 +1,89 @@
 # collector/main.py
 import sys
 import re
+import time
+from collections import deque
 from pathlib import Path
 from datetime import datetime
 import config
+import instrumentation
 import parsers
-import scheduler
-from ssh_manager import OntMonitor
+import samples
+import state
+from ssh_manager import OntMonitor, SessionLost
 
 def process_command(command: str, ont: OntMonitor):
+    """Streams the command's output straight into its parser while the device is still sending."""
     try:
-        raw_output = ont.run_command(command)
+        lines = ont.iter_lines(command)
+    except Exception as e:
+        print(f"[{ont.name}] Failed to process command '{command}': {e}")
+        return
+    process_output(command, lines, ont.name)
+
+def process_output(command: str, raw_output, device: str):
+    """raw_output is the whole reply as a string or an iterator over its lines, echo first."""
+    try:
+        collected_at = time.time()
         command_prefix = command.replace(' ', '_')
-        lines = raw_output.splitlines()
-        content_lines = [line for i, line in enumerate(lines) if i > 0 and not line.lower().startswith('success!')]
+        lines = raw_output.splitlines() if isinstance(raw_output, str) else raw_output
+        content_lines = (line for i, line in enumerate(lines) if i > 0 and not line.lower().startswith('success!'))
         port_match = re.search(r'portnum_(\d+)', command_prefix)
         port_label = port_match.group(1) if port_match else 'unknown'
-        base_labels = {'command': command_prefix, 'port': port_label}
-        
-        parser_map = {
-            "display deviceinfo": parsers.parse_deviceinfo,
-            "display waninfo all detail": parsers.parse_waninfo_all_detail,
-            "display wifi information": parsers.parse_wifi_information,
-            "display dhcp server user all": parsers.parse_dhcp_server,
-            "wap top": parsers.parse_wap_top,
-            "display sfwd drop statistics": parsers.parse_sfwd_drop,
-            "display lanport workmode": parsers.parse_lanport_workmode,
-            "display wifi associate": parsers.parse_wifi_associate,
-            "display portstatistics portnum 1": parsers.parse_key_value,
-        }
-        
-        output_lines = []
-        for key, parser_func in parser_map.items():
-            if key in command:
-                output_lines = parser_func(content_lines, command_prefix, base_labels)
-                break
-        else:
-            output_lines = parsers.parse_key_value(content_lines, command_prefix, base_labels)
+        base_labels = {'command': command_prefix, 'port': port_label, 'device': device}
+        digest = state.changes.hasher() if state.changes.tracks(command) else None
+        if digest is not None:
+            # Tracked commands are read whole (the DHCP lease table included) and hashed first,
+            # so an unchanged output is not parsed or stored. The snapshot is still rewritten
+            # with this run's collection time so it does not go stale.
+            content_lines = list(content_lines)
+            for line in content_lines: digest.update(line.encode('utf-8') + b'\n')
+            changed = state.changes.observe(device, command, digest.digest())
+            instrumentation.record_change(device, command_prefix, changed, state.changes.multiplier(device, command))
+            # A changed output forgets the previous families; they come back only if this one
+            # parses to samples, so an output that parses to nothing is never papered over.
+            families = state.changes.families.pop((device, command), None) if changed else state.changes.families.get((device, command))
+            if not changed and families is not None:
+                samples.write_snapshot(Path(config.CLEAN_DATA_DIR) / device / command_prefix / config.LATEST_FILENAME, families, collected_at)
+                instrumentation.record_snapshot(device, command_prefix)
+                print(f"[{device}] Output of '{command}' unchanged; refreshed the snapshot without parsing.")
+                return
+            content_lines = iter(content_lines)
+
+        # Thread CPU time, so time spent waiting on the device while streaming is not counted.
+        parse_start = time.thread_time()
+        output_samples = list(parsers.get_parser(command)(content_lines, command_prefix, base_labels))
+        deque(content_lines, maxlen=0)  # read up to the prompt even if the parser stopped early
+        instrumentation.record_parse(device, command_prefix, time.thread_time() - parse_start, len(output_samples))
 
-        if output_lines:
-            command_output_dir = Path(config.CLEAN_DATA_DIR) / command_prefix
+        if output_samples:
+            command_output_dir = Path(config.CLEAN_DATA_DIR) / device / command_prefix
             command_output_dir.mkdir(parents=True, exist_ok=True)
-            timestamp = datetime.now().strftime("%Y_%m_%d__%H_%M")
-            filename = f"{command_prefix}_{timestamp}.txt"
-            filepath = command_output_dir / filename
-            with open(filepath, 'w', encoding='utf-8') as f_out:
-                f_out.write('\n'.join(output_lines))
-            print(f"Successfully processed and saved '{command}' to {filepath}")
+            if config.HISTORY_BACKEND == 'text':
+                timestamp = datetime.fromtimestamp(collected_at).strftime("%Y_%m_%d__%H_%M_%S")
+                filepath = command_output_dir / f"{command_prefix}_{timestamp}.txt"
+                with open(filepath, 'w', encoding='utf-8') as f_out:
+                    f_out.write(samples.render_lines(output_samples))
+                state.retention.track_file(filepath)
+            else:
+                state.history_store.append(command_output_dir, output_samples, collected_at)
+                filepath = command_output_dir
+            families = samples.group(output_samples, parsers.metadata)
+            if digest is not None: state.changes.families[(device, command)] = families
+            samples.write_snapshot(command_output_dir / config.LATEST_FILENAME, families, collected_at)
+            instrumentation.record_snapshot(device, command_prefix)
+            print(f"[{device}] Successfully processed and saved '{command}' to {filepath}")
         else:
-            print(f"Warning: No parsable data generated for command '{command}'.")
+            print(f"[{device}] Warning: No parsable data generated for command '{command}'.")
+    except SessionLost as e:
+        print(f"[{device}] Failed to process command '{command}': {e}")
     except Exception as e:
-        print(f"Failed to process command '{command}': {e}")
+        instrumentation.record_parse_failure(device, command.replace(' ', '_'))
+        print(f"[{device}] Failed to process command '{command}': {e}")
 
 if __name__ == "__main__":
-    if not config.PASSWORD:
+    if not config.PASSWORD and not config.REPLAY_DIR:
         print("Error: ONT_PASSWORD environment variable not set. Please create a .env file.")
         sys.exit(1)
+    import scheduler
     scheduler.start()
@@ -1,193 +1,186 @@
 # collector/parsers.py
 import re
+from functools import lru_cache
+from samples import COUNTER, GAUGE, Sample, format_labels as _format_labels, metric_name as _name
 
-def _format_labels(labels_dict):
-    """Helper to convert a dictionary of labels to a Prometheus label string."""
-    if not labels_dict: return ""
-    return "{" + ",".join([f'{k}="{v}"' for k, v in sorted(labels_dict.items())]) + "}"
+# --- Command grammars, compiled once at import ---
+_NON_METRIC_CHARS = re.compile(r'[^a-zA-Z0-9_]')
+_NUMBER = re.compile(r'(\d+)')
+_UPTIME = re.compile(r'(\d+)\s*day\(s\)\s*(\d{2}):(\d{2}):(\d{2})')
+_DHCP_ROW = re.compile(r'^\s*(\d+)\s+(\S+)\s+([0-9.]+)\s+(\S+)\s+([0-9a-f:]+)\s+(.*)$', re.I)
+_DHCP_EXPIRE = re.compile(r'(\d+)\s*days,\s*(\d{2}):(\d{2}):(\d{2})')
+_LANPORT_ROW = re.compile(r'^\s*(\d+)\s+([\w\d]+)\s+([\w\s]+)\s*$')
+_WIFI_ASSOCIATE_ROW = re.compile(r'^([0-9A-F:]{17})\s+(\S+)\s+(\d+)\s+(\d+)M\s+(\d+)M.*$', re.I)
+_MAX_RATE = re.compile(r'(\d+)\s*M')
+_TOP_MEM = re.compile(r'(\d+)K\s+(\w+)')
+_TOP_CPU = re.compile(r'(\d+\.\d+)%\s+(\w+)')
+_TOP_LOAD_COMMAS = re.compile(r'Load average:\s+([\d.]+)\s*,\s*([\d.]+)\s*,\s*([\d.]+)')
+_TOP_LOAD_SPACES = re.compile(r'Load average:\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)')
+
+@lru_cache(maxsize=1024)
+def _clean_key(key):
+    """Normalises a device field name into a metric name fragment (memoised: the same few dozen keys repeat every run)."""
+    return _NON_METRIC_CHARS.sub('_', key).lower()
+
+@lru_cache(maxsize=1024)
+def _block_key(key):
+    return key.lower().replace(' ', '_').replace('.', '')
+
+def _to_seconds(days, h, m, s):
+    return (int(days) * 86400) + (int(h) * 3600) + (int(m) * 60) + int(s)
+
+def _number(text):
+    try:
+        return float(text)
+    except ValueError:
+        return None
 
 def parse_key_value(lines, command_prefix, base_labels, separator=':'):
-    output = []
     labels_str = _format_labels(base_labels)
     for line in lines:
-        if separator not in line: continue
-        parts = line.split(separator, 1)
-        if len(parts) != 2: continue
-        key, value = parts[0].strip(), parts[1].strip()
-        try:
-            float(value)
-            clean_key = re.sub(r'[^a-zA-Z0-9_]', '_', key).lower()
-            output.append(f"{command_prefix}_{clean_key}{labels_str} {value}")
-        except ValueError:
-            continue
-    return output
+        key, sep, value = line.partition(separator)
+        if not sep: continue
+        value = _number(value)
+        if value is None: continue
+        yield Sample(_name(command_prefix, _clean_key(key.strip())), labels_str, value)
 
 def parse_deviceinfo(lines, command_prefix, base_labels):
-    output = []
     labels_str = _format_labels(base_labels)
     for line in lines:
-        if '=' not in line: continue
-        key, value_str = [p.strip() for p in line.split('=', 1)]
-        key = key.lower()
+        key, sep, value_str = line.partition('=')
+        if not sep: continue
+        key = key.strip().lower()
         if key == 'uptime':
-            match = re.search(r'(\d+)\s*day\(s\)\s*(\d{2}):(\d{2}):(\d{2})', value_str)
-            if match:
-                days, h, m, s = map(int, match.groups())
-                total_seconds = (days * 86400) + (h * 3600) + (m * 60) + s
-                output.append(f"{command_prefix}_uptime_seconds{labels_str} {total_seconds}")
+            match = _UPTIME.search(value_str)
+            if match: yield Sample(_name(command_prefix, 'uptime_seconds'), labels_str, float(_to_seconds(*match.groups())))
         elif key == 'totalmemory':
-            match = re.search(r'(\d+)', value_str)
-            if match: output.append(f"{command_prefix}_total_memory_mb{labels_str} {match.group(1)}")
+            match = _NUMBER.search(value_str)
+            if match: yield Sample(_name(command_prefix, 'total_memory_mb'), labels_str, float(match.group(1)))
         elif key == 'totalflash':
-            match = re.search(r'(\d+)', value_str)
-            if match: output.append(f"{command_prefix}_total_flash_mb{labels_str} {match.group(1)}")
-    return output
+            match = _NUMBER.search(value_str)
+            if match: yield Sample(_name(command_prefix, 'total_flash_mb'), labels_str, float(match.group(1)))
 
 def parse_dhcp_server(lines, command_prefix, base_labels):
-    output, total_users = [], 0
+    total_users = 0
     for line in lines:
-        if line.strip().startswith('Total:'):
-            total_users = line.strip().split(':')[1].strip()
+        stripped = line.strip()
+        if stripped.startswith('Total:'):
+            total_users = stripped.split(':')[1].strip()
             continue
-        match = re.match(r'^\s*(\d+)\s+(\S+)\s+([0-9.]+)\s+(\S+)\s+([0-9a-f:]+)\s+(.*)$', line, re.I)
+        match = _DHCP_ROW.match(line)
         if match:
             index, port, ip, hostname, mac, expire_str = match.groups()
             specific_labels = {'index': index, 'port': port, 'ip': ip, 'hostname': hostname.strip(), 'mac': mac}
-            all_labels = {**base_labels, **specific_labels}
-            labels_str = _format_labels(all_labels)
-            output.append(f'{command_prefix}_lease_info{labels_str} 1')
-            expire_match = re.search(r'(\d+)\s*days,\s*(\d{2}):(\d{2}):(\d{2})', expire_str)
+            labels_str = _format_labels({**base_labels, **specific_labels})
+            yield Sample(_name(command_prefix, 'lease_info'), labels_str, 1.0)
+            expire_match = _DHCP_EXPIRE.search(expire_str)
             if expire_match:
-                days, h, m, s = map(int, expire_match.groups())
-                total_seconds = (days * 86400) + (h * 3600) + (m * 60) + s
-                output.append(f'{command_prefix}_lease_expire_seconds{labels_str} {total_seconds}')
+                yield Sample(_name(command_prefix, 'lease_expire_seconds'), labels_str, float(_to_seconds(*expire_match.groups())))
     if total_users:
-        output.append(f'{command_prefix}_total_users{_format_labels(base_labels)} {total_users}')
-    return output
+        yield Sample(_name(command_prefix, 'total_users'), _format_labels(base_labels), float(total_users))
+
+def _parse_blocks(lines, process_block):
+    """Single pass over '---'-separated blocks of 'Key : value' lines."""
+    block = {}
+    for line in lines:
+        if "---" in line:
+            yield from process_block(block)
+            block = {}
+            continue
+        key, sep, value = line.partition(':')
+        if sep: block[_block_key(key.strip())] = value.strip()
+    yield from process_block(block)
 
 def parse_waninfo_all_detail(lines, command_prefix, base_labels):
-    output, current_wan_info = [], {}
     def process_block(info):
         if not info or "interface" not in info: return
         ip_address = info.get("ipv4_address", "").split('/')[0]
         specific_labels = {'interface': info.get("interface"), 'hw_addr': info.get("hw_addr",""), 'ip_address': ip_address}
-        all_labels = {**base_labels, **specific_labels}
-        labels_str = _format_labels(all_labels)
-        status_numeric = 1 if info.get("status", "").lower() == 'enable' else 0
-        output.append(f'{command_prefix}_status{labels_str} {status_numeric}')
-        if info.get("vlan", "").isdigit(): output.append(f'{command_prefix}_vlan{labels_str} {info.get("vlan")}')
-        if info.get("mtu", "").isdigit(): output.append(f'{command_prefix}_mtu{labels_str} {info.get("mtu")}')
-    for line in lines:
-        if "---" in line:
-            process_block(current_wan_info)
-            current_wan_info = {}
-            continue
-        if ':' in line:
-            key, value = [p.strip() for p in line.split(':', 1)]
-            current_wan_info[key.lower().replace(' ', '_').replace('.', '')] = value
-    process_block(current_wan_info)
-    return output
+        labels_str = _format_labels({**base_labels, **specific_labels})
+        status_numeric = 1.0 if info.get("status", "").lower() == 'enable' else 0.0
+        yield Sample(_name(command_prefix, 'status'), labels_str, status_numeric)
+        if info.get("vlan", "").isdigit(): yield Sample(_name(command_prefix, 'vlan'), labels_str, float(info.get("vlan")))
+        if info.get("mtu", "").isdigit(): yield Sample(_name(command_prefix, 'mtu'), labels_str, float(info.get("mtu")))
+    yield from _parse_blocks(lines, process_block)
 
 def parse_lanport_workmode(lines, command_prefix, base_labels):
-    output = []
     for line in lines:
-        match = re.match(r'^\s*(\d+)\s+([\w\d]+)\s+([\w\s]+)\s*$', line)
+        match = _LANPORT_ROW.match(line)
         if match:
             index, name, mode_str = match.groups()
             specific_labels = {'index': index, 'name': name, 'workmode': mode_str.strip()}
-            all_labels = {**base_labels, **specific_labels}
-            labels_str = _format_labels(all_labels)
-            output.append(f'{command_prefix}_info{labels_str} 1')
-    return output
+            labels_str = _format_labels({**base_labels, **specific_labels})
+            yield Sample(_name(command_prefix, 'info'), labels_str, 1.0)
 
 def parse_wifi_associate(lines, command_prefix, base_labels):
-    output, band = [], None
+    band = None
     for line in lines:
         if "2.4GHz" in line: band = "2.4GHz"
         elif "5GHz" in line: band = "5GHz"
-        match = re.match(r'^([0-9A-F:]{17})\s+(\S+)\s+(\d+)\s+(\d+)M\s+(\d+)M.*$', line, re.I)
-        if match and band:
+        if not band: continue
+        match = _WIFI_ASSOCIATE_ROW.match(line)
+        if match:
             mac, ssid, time_sec, tx_rate, rx_rate = match.groups()
             specific_labels = {'mac': mac.replace(':', ''), 'ssid': ssid, 'band': band}
-            all_labels = {**base_labels, **specific_labels}
-            labels_str = _format_labels(all_labels)
-            output.append(f'{command_prefix}_uptime_seconds{labels_str} {time_sec}')
-            output.append(f'{command_prefix}_tx_rate_mbps{labels_str} {tx_rate}')
-            output.append(f'{command_prefix}_rx_rate_mbps{labels_str} {rx_rate}')
-    return output
+            labels_str = _format_labels({**base_labels, **specific_labels})
+            yield Sample(_name(command_prefix, 'uptime_seconds'), labels_str, float(time_sec))
+            yield Sample(_name(command_prefix, 'tx_rate_mbps'), labels_str, float(tx_rate))
+            yield Sample(_name(command_prefix, 'rx_rate_mbps'), labels_str, float(rx_rate))
 
 def parse_wifi_information(lines, command_prefix, base_labels):
-    output, current_ssid_info = [], {}
     def process_block(info):
         if not info or "ssid_index" not in info: return
         specific_labels = {'ssid_index': info.get("ssid_index"), 'ssid_name': info.get("ssid","")}
-        all_labels = {**base_labels, **specific_labels}
-        labels_str = _format_labels(all_labels)
-        status_numeric = 1 if info.get("status", "").lower() == 'up' else 0
-        output.append(f'{command_prefix}_status{labels_str} {status_numeric}')
-        channel_match = re.search(r'(\d+)', info.get("channel", ""))
-        if channel_match: output.append(f'{command_prefix}_channel{labels_str} {channel_match.group(1)}')
-        rate_match = re.search(r'(\d+)\s*M', info.get("supported_max_rate", ""))
-        if rate_match: output.append(f'{command_prefix}_max_rate_mbps{labels_str} {rate_match.group(1)}')
-    for line in lines:
-        if "---" in line:
-            process_block(current_ssid_info)
-            current_ssid_info = {}
-            continue
-        if ':' in line:
-            key, value = [p.strip() for p in line.split(':', 1)]
-            current_ssid_info[key.lower().replace(' ', '_')] = value
-    process_block(current_ssid_info)
-    return output
+        labels_str = _format_labels({**base_labels, **specific_labels})
+        status_numeric = 1.0 if info.get("status", "").lower() == 'up' else 0.0
+        yield Sample(_name(command_prefix, 'status'), labels_str, status_numeric)
+        channel_match = _NUMBER.search(info.get("channel", ""))
+        if channel_match: yield Sample(_name(command_prefix, 'channel'), labels_str, float(channel_match.group(1)))
+        rate_match = _MAX_RATE.search(info.get("supported_max_rate", ""))
+        if rate_match: yield Sample(_name(command_prefix, 'max_rate_mbps'), labels_str, float(rate_match.group(1)))
+    yield from _parse_blocks(lines, process_block)
 
 def parse_wap_top(lines, command_prefix, base_labels):
-    output = []
     labels_str = _format_labels(base_labels)
     for line in lines:
-        if line.strip().startswith('Mem:'):
-            parts = re.findall(r'(\d+)K\s+(\w+)', line)
-            for value, key in parts: output.append(f"{command_prefix}_mem_{key}_kb{labels_str} {value}")
-        elif line.strip().startswith('CPU:'):
-            parts = re.findall(r'(\d+\.\d+)%\s+(\w+)', line)
-            for value, key in parts: output.append(f"{command_prefix}_cpu_{key}_percent{labels_str} {value}")
-        elif line.strip().startswith('Load average:'):
-            match = re.search(r'Load average:\s+([\d.]+)\s*,\s*([\d.]+)\s*,\s*([\d.]+)', line)
-            if not match: match = re.search(r'Load average:\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)', line)
+        stripped = line.strip()
+        if stripped.startswith('Mem:'):
+            for value, key in _TOP_MEM.findall(line): yield Sample(_name(command_prefix, f'mem_{key}_kb'), labels_str, float(value))
+        elif stripped.startswith('CPU:'):
+            for value, key in _TOP_CPU.findall(line): yield Sample(_name(command_prefix, f'cpu_{key}_percent'), labels_str, float(value))
+        elif stripped.startswith('Load average:'):
+            match = _TOP_LOAD_COMMAS.search(line) or _TOP_LOAD_SPACES.search(line)
             if match:
                 load_1m, load_5m, load_15m = match.groups()
-                output.append(f"{command_prefix}_load_average_1m{labels_str} {load_1m}")
-                output.append(f"{command_prefix}_load_average_5m{labels_str} {load_5m}")
-                output.append(f"{command_prefix}_load_average_15m{labels_str} {load_15m}")
-    return output
+                yield Sample(_name(command_prefix, 'load_average_1m'), labels_str, float(load_1m))
+                yield Sample(_name(command_prefix, 'load_average_5m'), labels_str, float(load_5m))
+                yield Sample(_name(command_prefix, 'load_average_15m'), labels_str, float(load_15m))
 
 def parse_sfwd_drop(lines, command_prefix, base_labels):
-    output = []
     labels_str = _format_labels(base_labels)
+    header_line = None
     for line in lines:
+        if header_line is not None:
+            for key, value in zip(header_line, line.strip().split()):
+                value = _number(value)
+                if value is not None: yield Sample(_name(command_prefix, f'protocol_{_clean_key(key)}'), labels_str, value)
+            header_line = ()
         if ':' in line and not line.strip().startswith('['):
             key, value = [p.strip() for p in line.split(':', 1)]
-            output.append(f"{command_prefix}_{key}{labels_str} {value}")
-    header_line, value_line = None, None
-    for i, line in enumerate(lines):
-        if 'bcast' in line and 'arp' in line:
+            value = _number(value)
+            if value is not None: yield Sample(_name(command_prefix, key), labels_str, value)
+        if header_line is None and 'bcast' in line and 'arp' in line:
             header_line = line.strip().split()
-            if i + 1 < len(lines): value_line = lines[i+1].strip().split()
-            break
-    if header_line and value_line:
-        for key, value in zip(header_line, value_line):
-            clean_key = re.sub(r'[^a-zA-Z0-9_]', '_', key).lower()
-            output.append(f"{command_prefix}_protocol_{clean_key}{labels_str} {value}")
-    return output
 
 def parse_cpu_info(lines, command_prefix, base_labels):
-    output, cpu_data, processor_id = [], {}, None
+    cpu_data, processor_id = {}, None
     for line in lines:
         if not line.strip():
             if processor_id is not None and 'BogoMIPS' in cpu_data:
                 specific_labels = {'processor': processor_id}
                 all_labels = {**base_labels, **specific_labels}
                 labels_str = _format_labels(all_labels)
-                output.append(f"{command_prefix}_bogomips{labels_str} {cpu_data['BogoMIPS']}")
+                yield Sample(_name(command_prefix, 'bogomips'), labels_str, float(cpu_data['BogoMIPS']))
             cpu_data, processor_id = {}, None
             continue
         if ':' in line:
@@ -198,5 +191,60 @@ def parse_cpu_info(lines, command_prefix, base_labels):
         specific_labels = {'processor': processor_id}
         all_labels = {**base_labels, **specific_labels}
         labels_str = _format_labels(all_labels)
-        output.append(f"{command_prefix}_bogomips{labels_str} {cpu_data['BogoMIPS']}")
-    return output
\ No newline at end of file
+        yield Sample(_name(command_prefix, 'bogomips'), labels_str, float(cpu_data['BogoMIPS']))
+
+# --- Parser registry: each collected command maps to exactly one grammar ---
+PARSERS = {
+    "display deviceinfo": parse_deviceinfo,
+    "display waninfo all detail": parse_waninfo_all_detail,
+    "display wifi information": parse_wifi_information,
+    "display dhcp server user all": parse_dhcp_server,
+    "wap top": parse_wap_top,
+    "display sfwd drop statistics": parse_sfwd_drop,
+    "display lanport workmode": parse_lanport_workmode,
+    "display wifi associate": parse_wifi_associate,
+    "display portstatistics portnum 1": parse_key_value,
+}
+
+@lru_cache(maxsize=64)
+def get_parser(command):
+    """Returns the parser registered for a command, falling back to generic key/value parsing."""
+    for key, parser_func in PARSERS.items():
+        if key in command: return parser_func
+    return parse_key_value
+
+# --- Exposition metadata (TYPE, HELP) per metric family ---
+METADATA = {
+    "display_deviceinfo_uptime_seconds": (GAUGE, "Time since the ONT last booted."),
+    "display_deviceinfo_total_memory_mb": (GAUGE, "Total memory of the ONT in MB."),
+    "display_deviceinfo_total_flash_mb": (GAUGE, "Total flash storage of the ONT in MB."),
+    "display_waninfo_all_detail_status": (GAUGE, "Whether the WAN interface is enabled (1) or not (0)."),
+    "display_waninfo_all_detail_vlan": (GAUGE, "VLAN id of the WAN interface."),
+    "display_waninfo_all_detail_mtu": (GAUGE, "MTU of the WAN interface."),
+    "display_wifi_information_status": (GAUGE, "Whether the SSID is up (1) or not (0)."),
+    "display_wifi_information_channel": (GAUGE, "Radio channel of the SSID."),
+    "display_wifi_information_max_rate_mbps": (GAUGE, "Maximum supported rate of the SSID in Mbit/s."),
+    "display_dhcp_server_user_all_lease_info": (GAUGE, "One series per DHCP lease; the labels carry the lease details."),
+    "display_dhcp_server_user_all_lease_expire_seconds": (GAUGE, "Time left on the DHCP lease."),
+    "display_dhcp_server_user_all_total_users": (GAUGE, "Number of DHCP users reported by the ONT."),
+    "display_lanport_workmode_info": (GAUGE, "One series per LAN port; the labels carry its work mode."),
+    "display_wifi_associate_uptime_seconds": (GAUGE, "How long the wireless client has been associated."),
+    "display_wifi_associate_tx_rate_mbps": (GAUGE, "Transmit rate to the wireless client in Mbit/s."),
+    "display_wifi_associate_rx_rate_mbps": (GAUGE, "Receive rate from the wireless client in Mbit/s."),
+    "wap_top_load_average_1m": (GAUGE, "One-minute load average."),
+    "wap_top_load_average_5m": (GAUGE, "Five-minute load average."),
+    "wap_top_load_average_15m": (GAUGE, "Fifteen-minute load average."),
+}
+_TOP_FAMILIES = re.compile(r'^wap_top_(mem_(\w+)_kb|cpu_(\w+)_percent)$')
+# Drop statistics and port packet/byte totals only ever grow until the ONT reboots.
+_COUNTER_FAMILIES = re.compile(r'^display_sfwd_drop_statistics_|^display_portstatistics_portnum_\d+_\w+_(packets|bytes)$')
+
+@lru_cache(maxsize=1024)
+def metadata(name):
+    """Returns (type, help) for a metric family; families named after device fields get a generic help text."""
+    known = METADATA.get(name)
+    if known: return known
+    top = _TOP_FAMILIES.match(name)
+    if top: return GAUGE, f"Memory {top.group(2)} in KB, from top." if top.group(2) else f"CPU time in {top.group(3)}, in percent, from top."
+    if _COUNTER_FAMILIES.search(name): return COUNTER, "Counter as reported by the ONT."
+    return GAUGE, "Value as reported by the ONT."
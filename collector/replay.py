@@ -0,0 +1,60 @@
+# collector/replay.py
+import itertools
+import os
+import time
+from ssh_manager import OntMonitor
+
+class ReplayMonitor(OntMonitor):
+    """Stands in for a device by replaying recorded outputs, optionally with a fixed delay.
+
+    Recordings are looked up per command either as <dir>/<command_prefix>/*.txt (what
+    OntMonitor writes with record_dir, one device's subdirectory) or as a single
+    <dir>/<command_prefix>.txt (the benchmarks/samples layout); several recordings of
+    one command are replayed in turn. `responses` can map commands to raw outputs directly.
+    """
+    def __init__(self, recordings_dir=None, latency=0.0, name='replay', responses=None, prompt='WAP>'):
+        super().__init__('replay', 0, None, None, name=name)
+        self.recordings_dir, self.latency = recordings_dir, latency
+        self.prompt = prompt
+        self.responses = {command: itertools.cycle([output]) for command, output in (responses or {}).items()}
+
+    def is_alive(self):
+        return True
+
+    def connect(self):
+        return
+
+    def close(self):
+        return
+
+    def _recordings(self, command):
+        cycle = self.responses.get(command)
+        if cycle: return cycle
+        prefix = command.replace(' ', '_')
+        command_dir = os.path.join(self.recordings_dir or '', prefix)
+        if os.path.isdir(command_dir):
+            paths = [os.path.join(command_dir, f) for f in sorted(os.listdir(command_dir)) if f.endswith('.txt')]
+        else:
+            paths = [command_dir + '.txt'] if os.path.exists(command_dir + '.txt') else []
+        if not paths: raise Exception(f"No recording for '{command}' in {self.recordings_dir}.")
+        outputs = []
+        for path in paths:
+            with open(path, encoding='utf-8') as f: outputs.append(f.read())
+        cycle = self.responses[command] = itertools.cycle(outputs)
+        return cycle
+
+    def run_command(self, command, timeout=None):
+        start = time.monotonic()
+        output = next(self._recordings(command))
+        if self.latency: time.sleep(self.latency)
+        self._record_stats(command, time.monotonic() - start, len(output.encode('utf-8')), False)
+        cleaned_output = self._clean(output)
+        if cleaned_output.rstrip().endswith(self.prompt):
+            cleaned_output = cleaned_output.rstrip()[:-len(self.prompt)]
+        return cleaned_output
+
+    def iter_lines(self, command, timeout=None):
+        return iter(self.run_command(command, timeout).splitlines())
+
+    def run_batch(self, commands, on_output, timeout=None):
+        for command in commands: on_output(command, self.run_command(command, timeout))
@@ -0,0 +1,94 @@
+# collector/retention.py
+import heapq
+import os
+import threading
+import time
+from pathlib import Path
+from history import SEGMENT_SUFFIX
+
+def parse_duration(value):
+    """Converts '7d', '48h' or '15m' into seconds."""
+    units = {'d': 86400, 'h': 3600, 'm': 60}
+    unit = value[-1].lower()
+    if unit not in units: raise ValueError(f"Invalid duration unit '{unit}' in '{value}'")
+    return int(value[:-1]) * units[unit]
+
+class RetentionEngine:
+    """Deletes expired data in small time-boxed slices instead of one `find -delete` sweep.
+
+    Every retained item (a legacy .txt file or a history segment) sits in a heap keyed
+    by the time it expires, so a slice only ever touches items that are due. New items
+    are registered by the collector as it writes them; a periodic rescan, itself done
+    slice by slice, picks up anything written before startup or by someone else.
+    """
+    def __init__(self, data_dir, retention_seconds, history_store):
+        self.data_dir, self.retention_seconds, self.history_store = Path(data_dir), retention_seconds, history_store
+        self.heap, self.known, self.scan_stack = [], set(), []
+        self.lock = threading.Lock()
+        self.files_reclaimed = self.bytes_reclaimed = 0
+        self.seconds_spent = 0.0
+
+    def _push(self, expires_at, path, segment_start=None):
+        with self.lock:
+            if path in self.known: return
+            self.known.add(path)
+            heapq.heappush(self.heap, (expires_at, path, segment_start))
+
+    def track_file(self, path, mtime=None):
+        self._push((time.time() if mtime is None else mtime) + self.retention_seconds, str(path))
+
+    def track_segment(self, command_dir, start):
+        expires_at = start + self.history_store.segment_seconds + self.retention_seconds
+        self._push(expires_at, str(Path(command_dir) / f"{start}{SEGMENT_SUFFIX}"), start)
+
+    def rescan(self):
+        """Queues a walk of the data directory; the walk itself happens inside run_slice()."""
+        if not self.scan_stack: self.scan_stack.append(str(self.data_dir))
+
+    def _scan_directory(self, path):
+        try:
+            entries = list(os.scandir(path))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                self.scan_stack.append(entry.path)
+            elif entry.name.endswith('.txt'):
+                if entry.path not in self.known: self.track_file(entry.path, entry.stat().st_mtime)
+            elif entry.name.endswith(SEGMENT_SUFFIX) and entry.name[:-len(SEGMENT_SUFFIX)].isdigit():
+                if entry.path not in self.known: self.track_segment(path, int(entry.name[:-len(SEGMENT_SUFFIX)]))
+
+    def _delete(self, path, segment_start):
+        if segment_start is not None:
+            return self.history_store.drop_segment(os.path.dirname(path), segment_start)
+        try:
+            size = os.stat(path).st_size
+            os.unlink(path)
+            return 1, size
+        except FileNotFoundError:
+            return 0, 0
+
+    def run_slice(self, budget=0.05):
+        """Continues any pending rescan, then deletes expired items until `budget` seconds are used up."""
+        start = time.monotonic()
+        deadline = start + budget
+        files = freed = 0
+        while self.scan_stack and time.monotonic() < deadline:
+            self._scan_directory(self.scan_stack.pop())
+        now = time.time()
+        while time.monotonic() < deadline:
+            with self.lock:
+                if not self.heap or self.heap[0][0] > now: break
+                _, path, segment_start = heapq.heappop(self.heap)
+                self.known.discard(path)
+            deleted, deleted_bytes = self._delete(path, segment_start)
+            files, freed = files + deleted, freed + deleted_bytes
+        elapsed = time.monotonic() - start
+        self.files_reclaimed += files
+        self.bytes_reclaimed += freed
+        self.seconds_spent += elapsed
+        if files:
+            print(f"Retention: reclaimed {files} files ({freed} bytes) in {elapsed * 1000:.1f} ms; "
+                  f"{len(self.heap)} items tracked, {self.files_reclaimed} files / {self.bytes_reclaimed} bytes "
+                  f"reclaimed in {self.seconds_spent:.2f}s since start.")
+        return files, freed, elapsed
@@ -0,0 +1,78 @@
+# collector/samples.py
+import json
+import os
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+COUNTER, GAUGE = 'counter', 'gauge'
+
+class Sample:
+    """One parsed value. `name` and `labels` (the rendered `{k="v",...}` set) are interned,
+    so the thousands of samples a run produces share a few hundred strings; `timestamp`
+    stays None for "the collection time of the run"."""
+    __slots__ = ('name', 'labels', 'value', 'timestamp')
+
+    def __init__(self, name, labels, value, timestamp=None):
+        self.name, self.labels, self.value, self.timestamp = name, labels, value, timestamp
+
+    def __repr__(self):
+        return f"Sample({self.name}{self.labels} {self.value})"
+
+@lru_cache(maxsize=1024)
+def metric_name(command_prefix, suffix):
+    return sys.intern(f"{command_prefix}_{suffix}")
+
+# Upper bound on distinct label sets kept formatted; a busy ONT has a few hundred.
+LABEL_CACHE_SIZE = 4096
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+@lru_cache(maxsize=LABEL_CACHE_SIZE)
+def _format_label_set(label_items):
+    """Renders and interns one frozen label set; escaping runs once per unique set."""
+    return sys.intern("{" + ",".join([f'{k}="{_escape_label_value(v)}"' for k, v in sorted(label_items)]) + "}")
+
+def format_labels(labels_dict):
+    """Helper to convert a dictionary of labels to a Prometheus label string."""
+    if not labels_dict: return ""
+    return _format_label_set(tuple(labels_dict.items()))
+
+def label_cache_info():
+    """Hits, misses and size of the label-set cache."""
+    return _format_label_set.cache_info()
+
+def format_value(value):
+    if value.is_integer() and abs(value) < 1e15: return str(int(value))
+    if value != value: return 'NaN'
+    if value in (float('inf'), float('-inf')): return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+def group(samples, metadata):
+    """Groups one run's samples into snapshot families (see write_snapshot); `metadata(name)`
+    returns a family's (type, help)."""
+    families = {}
+    for sample in samples:
+        rows = families.get(sample.name)
+        if rows is None: rows = families[sample.name] = []
+        rows.append([sample.labels, sample.value] if sample.timestamp is None else [sample.labels, sample.value, '', sample.timestamp])
+    return [(name, *metadata(name), rows) for name, rows in families.items()]
+
+def write_snapshot(path, families, timestamp):
+    """Replaces a structured snapshot atomically so the exporter never sees a partial file.
+
+    The file is JSON: {"timestamp": collection time, "families": [[name, type, help, rows]]}.
+    A row is [labels, value], optionally followed by the suffix that makes the sample name
+    from the family name ('_bucket', '_total', ...) and the sample's own timestamp. The
+    exporter merges these across commands and devices and encodes the exposition format.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'timestamp': timestamp, 'families': families}, separators=(',', ':')))
+    os.replace(tmp_path, path)
+
+def render_lines(samples):
+    """Plain `name{labels} value` lines, as kept by HISTORY_BACKEND=text."""
+    return '\n'.join([f"{s.name}{s.labels} {format_value(s.value)}" for s in samples])
@@ -1,73 +1,163 @@
 # collector/scheduler.py
+import os
+import random
+import threading
 import time
-import schedule
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
 import config
+import instrumentation
+import samples
+import state
+from replay import ReplayMonitor
 from ssh_manager import OntMonitor, load_ssh_config
-from main import process_command
+from main import process_command, process_output
+from retention import parse_duration
 
-def cleanup_old_files():
-    print("--- Running Cleanup Job ---")
-    try:
-        retention_str = config.CLEANUP_OLDER_THAN
-        value = int(retention_str[:-1])
-        unit = retention_str[-1].lower()
-        command = ["find", config.CLEAN_DATA_DIR, "-type", "f", "-name", "*.txt"]
-        if unit == 'd': command.extend(["-mtime", f"+{value}"])
-        elif unit == 'h': command.extend(["-mmin", f"+{value * 60}"])
-        elif unit == 'm': command.extend(["-mmin", f"+{value}"])
-        else:
-            print(f"Warning: Invalid cleanup unit '{unit}'. Cleanup skipped.")
-            return
-        command.append("-delete")
-        subprocess.run(command, check=True)
-        print(f"Successfully deleted files older than {retention_str}.")
-    except Exception as e:
-        print(f"Cleanup job failed: {e}")
+class Tier:
+    """A job that should start every `interval` seconds, on multiples of the interval."""
+    def __init__(self, name, interval, func, *args):
+        self.name, self.interval, self.func, self.args = name, interval, func, args
+        self.first_delay = 0.0
+        self.next_run = None
+        self.started = False
+        self.running = False
+        self.runs = self.overruns = self.skipped = 0
+        self.last_duration = self.last_lag = 0.0
+
+    def align(self, now):
+        """Puts the next run on a wall-clock multiple of the interval (at least half an interval
+        away), expressed on the monotonic clock so later ticks cannot drift."""
+        delay = self.interval - time.time() % self.interval
+        if delay < self.interval / 2: delay += self.interval
+        self.next_run = now + delay
 
-def run_job(commands, ont):
+def run_device_job(commands, ont):
+    commands = [cmd for cmd in commands if not state.changes.tracks(cmd) or state.changes.should_run(ont.name, cmd)]
+    if not commands: return
+    with ont.lock:
+        try:
+            ont.connect()
+            if config.PIPELINE_COMMANDS:
+                ont.run_batch(commands, lambda cmd, output: process_output(cmd, output, ont.name))
+                return
+            for cmd in commands:
+                process_command(cmd, ont)
+        except Exception as e:
+            print(f"[{ont.name}] Job failed: {e}")
+
+def run_job(commands, pool, executor):
     print(f"\n--- Running Job: {time.strftime('%Y-%m-%d %H:%M:%S')} ---")
+    start = time.monotonic()
+    list(executor.map(lambda ont: run_device_job(commands, ont), pool.values()))
+    cache = samples.label_cache_info()
+    print(f"--- Job finished on {len(pool)} device(s) in {time.monotonic() - start:.2f}s "
+          f"(label cache: {cache.hits} hits, {cache.misses} misses, {cache.currsize} sets) ---")
+
+def build_pool(aliases):
+    """One persistent OntMonitor per device alias; aliases that fail to resolve are skipped.
+    With REPLAY_DIR set, every alias replays its recordings instead."""
+    pool = {}
+    for alias in aliases:
+        if config.REPLAY_DIR:
+            pool[alias] = ReplayMonitor(os.path.join(config.REPLAY_DIR, alias), config.REPLAY_LATENCY, name=alias)
+            continue
+        try:
+            host, port, username = load_ssh_config(alias)
+        except Exception as e:
+            print(f"Failed to load SSH config for '{alias}': {e}")
+            continue
+        pool[alias] = OntMonitor(host, port, username, config.PASSWORD, command_timeout=config.COMMAND_TIMEOUT, name=alias,
+                                 keepalive=config.SSH_KEEPALIVE, reconnect_attempts=config.SSH_RECONNECT_ATTEMPTS,
+                                 reconnect_delay=config.SSH_RECONNECT_DELAY, record_dir=config.RECORD_DIR)
+    return pool
+
+def run_tier(tier, scheduled, lock):
+    start = time.monotonic()
+    tier.last_lag = start - scheduled
     try:
-        ont.connect()
-        for cmd in commands:
-            process_command(cmd, ont)
+        tier.func(*tier.args)
     except Exception as e:
-        print(f"Job failed: {e}")
+        print(f"Tier '{tier.name}' failed: {e}")
+    tier.last_duration = time.monotonic() - start
+    tier.runs += 1
+    if tier.last_duration > tier.interval:
+        tier.overruns += 1
+        print(f"Warning: tier '{tier.name}' took {tier.last_duration:.1f}s, longer than its {tier.interval}s interval.")
+    instrumentation.record_tier_run(tier)
+    tier.running = False
+    with lock:
+        try:
+            instrumentation.flush()
+        except Exception as e:
+            print(f"Failed to write collector metrics: {e}")
+
+def run_forever(tiers, stop_event=None):
+    """Deadline loop on the monotonic clock. Every tier runs once after its `first_delay` (right
+    away by default) and then on its aligned grid; tiers run concurrently, and a tier whose
+    previous run is still going skips the tick (and counts it) instead of queueing up lag."""
+    stop_event = stop_event or threading.Event()
+    metrics_lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=len(tiers), thread_name_prefix='tier') as tier_executor:
+        while not stop_event.is_set():
+            now = time.monotonic()
+            for tier in tiers:
+                if tier.next_run is None: tier.next_run = now + tier.first_delay
+                if now < tier.next_run: continue
+                scheduled = tier.next_run
+                if not tier.started:
+                    tier.started = True
+                    tier.align(now)
+                else:
+                    missed = int((now - scheduled) // tier.interval)
+                    tier.next_run = scheduled + (missed + 1) * tier.interval
+                    skipped = missed + (1 if tier.running else 0)
+                    if skipped:
+                        tier.skipped += skipped
+                        instrumentation.record_tier_skipped(tier, skipped)
+                        print(f"Warning: tier '{tier.name}' skipped {skipped} tick(s).")
+                    if tier.running: continue
+                tier.running = True
+                tier_executor.submit(run_tier, tier, scheduled, metrics_lock)
+            stop_event.wait(max(0.0, min(tier.next_run for tier in tiers) - time.monotonic()))
+
+def stagger(tiers, background, jitter):
+    """Spreads the collection tiers' first runs over up to `jitter` seconds and holds the
+    background tiers until that window has passed."""
+    for tier in tiers:
+        tier.first_delay = random.uniform(0, min(jitter, tier.interval))
+    for tier in background:
+        tier.first_delay = jitter
 
 def start():
+    pool = build_pool(config.SSH_HOST_ALIASES)
+    if not pool: return
+    executor = ThreadPoolExecutor(max_workers=min(config.MAX_PARALLEL_DEVICES, len(pool)), thread_name_prefix='device')
     try:
-        host, port, username = load_ssh_config(config.SSH_HOST_ALIAS)
-    except Exception as e:
-        print(f"Failed to load SSH config for '{config.SSH_HOST_ALIAS}': {e}")
-        return
-    ont_monitor = OntMonitor(host, port, username, config.PASSWORD)
-    schedule.every(30).seconds.do(run_job, commands=config.COMMANDS_30_SEC, ont=ont_monitor)
-    schedule.every(1).minutes.do(run_job, commands=config.COMMANDS_1_MIN, ont=ont_monitor)
-    schedule.every(5).minutes.do(run_job, commands=config.COMMANDS_5_MIN, ont=ont_monitor)
-    try:
-        freq_val = int(config.CLEANUP_FREQUENCY[:-1])
-        freq_unit = config.CLEANUP_FREQUENCY[-1].lower()
-        scheduler = schedule.every(freq_val)
-        if freq_unit == 'm': scheduler.minutes.do(cleanup_old_files)
-        elif freq_unit == 'h': scheduler.hours.do(cleanup_old_files)
-        elif freq_unit == 'd': scheduler.days.at("03:00").do(cleanup_old_files)
-        else: raise ValueError(f"Invalid frequency unit: {freq_unit}")
-        print(f"Cleanup job scheduled to run every {config.CLEANUP_FREQUENCY}.")
-    except Exception as e:
-        print(f"Error scheduling cleanup job: {e}. Defaulting to every 1 day.")
-        schedule.every(1).day.at("03:00").do(cleanup_old_files)
-    print("--- Unified Collector & Parser Started ---")
-    run_job(config.COMMANDS_30_SEC, ont_monitor)
-    run_job(config.COMMANDS_1_MIN, ont_monitor)
-    run_job(config.COMMANDS_5_MIN, ont_monitor)
-
-    cleanup_old_files()
-    
+        rescan_interval = parse_duration(config.CLEANUP_FREQUENCY)
+    except ValueError as e:
+        print(f"Error scheduling retention rescan: {e}. Defaulting to every 1 day.")
+        rescan_interval = 86400
+    collection = [
+        Tier('30s', 30, run_job, config.COMMANDS_30_SEC, pool, executor),
+        Tier('1m', 60, run_job, config.COMMANDS_1_MIN, pool, executor),
+        Tier('5m', 300, run_job, config.COMMANDS_5_MIN, pool, executor),
+    ]
+    background = [
+        Tier('retention', config.RETENTION_SLICE_INTERVAL, state.retention.run_slice, config.RETENTION_SLICE_BUDGET),
+        Tier('rescan', rescan_interval, state.retention.rescan),
+    ]
+    tiers = collection + background
+    if config.STARTUP_MODE == 'staggered':
+        stagger(collection, background, config.STARTUP_JITTER)
+        print("Staggered startup: first runs at " + ", ".join(f"{t.name} +{t.first_delay:.1f}s" for t in tiers) + ".")
+    elif config.STARTUP_MODE != 'immediate':
+        print(f"Warning: unknown STARTUP_MODE '{config.STARTUP_MODE}', running every tier right away.")
+    print(f"Retention rescan scheduled to run every {config.CLEANUP_FREQUENCY}.")
+    print(f"--- Unified Collector & Parser Started in {instrumentation.record_startup('ready'):.2f}s ---")
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+        run_forever(tiers)
     except KeyboardInterrupt:
         print("\nShutting down...")
     finally:
-        ont_monitor.close()
\ No newline at end of file
+        executor.shutdown(wait=False)
+        for ont in pool.values(): ont.close()
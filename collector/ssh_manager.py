@@ -1,53 +1,265 @@
 # collector/ssh_manager.py
-import paramiko
+import codecs
+import random
+import socket
+import threading
 import time
 import re
 import os
+from datetime import datetime
+import instrumentation
+
+class SessionLost(Exception):
+    """The device closed the SSH channel."""
 
 class OntMonitor:
     """Manages the SSH connection and command execution on the device."""
-    def __init__(self, host, port, username, password, timeout=10):
+    def __init__(self, host, port, username, password, timeout=10, command_timeout=30, name=None,
+                 keepalive=15, reconnect_attempts=3, reconnect_delay=0.5, reconnect_max_delay=10, record_dir=None):
+        self.name = name or host
         self.host, self.port, self.username, self.password, self.timeout = host, port, username, password, timeout
-        self.client, self.shell = None, None
+        self.command_timeout, self.keepalive = command_timeout, keepalive
+        self.reconnect_attempts, self.reconnect_delay, self.reconnect_max_delay = reconnect_attempts, reconnect_delay, reconnect_max_delay
+        self.client, self.shell, self.prompt = None, None, None
+        self.record_dir = record_dir
+        self.last_stats = None
+        self.lock = threading.Lock()
         self.ansi_escape_pattern = re.compile(r'\x1b\[[0-9;?]*[a-zA-Z]')
 
+    def is_alive(self):
+        """True while the transport is up and the shell channel is still open."""
+        if not self.client or not self.shell: return False
+        transport = self.client.get_transport()
+        return bool(transport and transport.is_active()) and not self.shell.closed and not self.shell.exit_status_ready()
+
     def connect(self):
-        if self.client: return
+        """Makes sure there is a live session, reconnecting with jittered exponential backoff."""
+        if self.is_alive(): return
+        if self.client:
+            print(f"[{self.name}] SSH session is no longer alive, reconnecting.")
+            self.close()
+        delay = self.reconnect_delay
+        for attempt in range(1, self.reconnect_attempts + 1):
+            try:
+                self._open()
+                return
+            except Exception:
+                if attempt == self.reconnect_attempts: raise
+                pause = random.uniform(delay / 2, delay)
+                print(f"[{self.name}] Retrying connection in {pause:.1f}s (attempt {attempt + 1}/{self.reconnect_attempts}).")
+                time.sleep(pause)
+                delay = min(delay * 2, self.reconnect_max_delay)
+
+    def _open(self):
+        import paramiko  # imported on first connect, so a replaying collector never loads it
         try:
             self.client = paramiko.SSHClient()
             self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             print(f"Connecting to {self.host}:{self.port}...")
-            self.client.connect(self.host, port=self.port, username=self.username, password=self.password, timeout=self.timeout)
+            self.client.connect(self.host, port=self.port, username=self.username, password=self.password, timeout=self.timeout,
+                                banner_timeout=self.timeout, auth_timeout=self.timeout, look_for_keys=False, allow_agent=False)
+            if self.keepalive: self.client.get_transport().set_keepalive(self.keepalive)
             self.shell = self.client.invoke_shell()
-            time.sleep(1)
-            if self.shell.recv_ready(): self.shell.recv(65535)
-            print("Successfully connected to the router.")
+            self.prompt = self._wait_for_prompt(time.monotonic() + self.timeout)
+            instrumentation.record_connect(self.name, True)
+            print(f"Successfully connected to the router (prompt: {self.prompt!r}).")
         except Exception as e:
             print(f"Error connecting to SSH: {e}")
+            instrumentation.record_connect(self.name, False)
             self.close()
             raise
 
     def close(self):
+        """Closes the session; the learned prompt is kept to recognise the device on reconnect."""
         if self.client:
             self.client.close()
             self.client, self.shell = None, None
             print("SSH connection closed.")
 
-    def run_command(self, command, wait=3):
-        if not self.shell: raise Exception("SSH shell not connected.")
-        print(f"Running command: {command}")
-        self.shell.send(command + "\n")
-        time.sleep(wait)
+    def _clean(self, text):
+        return self.ansi_escape_pattern.sub('', text).replace('\x07', '')
+
+    def _wait_for_prompt(self, deadline):
+        """Reads the login banner until the CLI sits at a prompt: the previously learned one,
+        or else an unterminated last line ending in '>', '#' or '$'. Falls back to nudging the
+        CLI with a newline and taking the last line it prints."""
         output = ""
-        while self.shell.recv_ready():
-            output += self.shell.recv(65535).decode('utf-8', errors='ignore')
-            time.sleep(0.1)
-        cleaned_output = self.ansi_escape_pattern.sub('', output)
-        return cleaned_output.replace('\x07', '')
+        while time.monotonic() < deadline:
+            self.shell.settimeout(max(0.01, deadline - time.monotonic()))
+            try:
+                chunk = self.shell.recv(65535)
+            except socket.timeout:
+                break
+            if not chunk: raise SessionLost("SSH channel closed by the device.")
+            output += chunk.decode('utf-8', errors='ignore')
+            last_line = self._clean(output).rsplit('\n', 1)[-1].strip()
+            if self.prompt and last_line.endswith(self.prompt): return self.prompt
+            if last_line[-1:] in ('>', '#', '$'): return last_line
+        self.shell.send("\n")
+        output, _ = self._read(time.monotonic() + self.timeout, idle=0.5)
+        lines = [l.strip() for l in self._clean(output).splitlines() if l.strip()]
+        return lines[-1] if lines else None
+
+    def _recv(self, deadline, idle=None):
+        """One read from the shell: the next chunk of bytes, or None once the deadline
+        passes (or, with `idle`, once the stream has been quiet that long)."""
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: return None
+            self.shell.settimeout(min(remaining, idle) if idle else remaining)
+            try:
+                chunk = self.shell.recv(65535)
+            except socket.timeout:
+                if idle: return None
+                continue
+            if not chunk:
+                self.close()
+                raise SessionLost("SSH channel closed by the device.")
+            return chunk
+
+    def _read(self, deadline, idle):
+        """Reads until the stream has been quiet for `idle` seconds. Returns (output, bytes_read)."""
+        chunks = []
+        while True:
+            chunk = self._recv(deadline, idle)
+            if chunk is None: break
+            chunks.append(chunk)
+        data = b"".join(chunks)
+        return data.decode('utf-8', errors='ignore'), len(data)
+
+    def _record_stats(self, command, latency, nbytes, timed_out):
+        self.last_stats = {'command': command, 'latency': latency, 'bytes': nbytes, 'timed_out': timed_out}
+        instrumentation.record_command(self.name, self.last_stats)
+        print(f"Command '{command}' took {latency:.2f}s ({nbytes} bytes)")
+
+    def _save_recording(self, command, output):
+        """Keeps the device's raw reply under <record_dir>/<device>/<command>/ for ReplayMonitor."""
+        if not self.record_dir: return
+        try:
+            command_dir = os.path.join(self.record_dir, self.name, command.replace(' ', '_'))
+            os.makedirs(command_dir, exist_ok=True)
+            with open(os.path.join(command_dir, datetime.now().strftime('%Y%m%d_%H%M%S_%f.txt')), 'w', encoding='utf-8') as f:
+                f.write(output)
+        except OSError as e:
+            print(f"[{self.name}] Failed to record output of '{command}': {e}")
+
+    def iter_lines(self, command, timeout=None):
+        """Runs a command and returns an iterator over its output lines (the echo first,
+        the trailing prompt dropped) that yields each line as soon as it has arrived, so
+        a parser can work through the output while the device is still sending it."""
+        self.connect()
+        print(f"Running command: {command}")
+        return self._stream(command, timeout or self.command_timeout)
+
+    def _stream(self, command, timeout):
+        """Bytes go through an incremental UTF-8 decoder, so a character split across two
+        reads survives, and only the unfinished last line is held back; the reply is
+        never buffered whole (unless it is being recorded)."""
+        start = time.monotonic()
+        deadline = start + timeout
+        idle = None if self.prompt else 1.0
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        recording = [] if self.record_dir else None
+        partial, nbytes, sent, retried, at_prompt, finished = "", 0, False, False, False, False
+        try:
+            while True:
+                try:
+                    if not sent:
+                        self.shell.send(command + "\n")
+                        sent = True
+                    chunk = self._recv(deadline, idle)
+                except (SessionLost, OSError, EOFError) as e:
+                    if nbytes or retried: raise SessionLost(f"Session lost during '{command}': {e}") from e
+                    # The session died between the liveness check and the reply; nothing has been
+                    # read yet and display commands are safe to repeat, so reconnect and resend once.
+                    print(f"[{self.name}] Session lost during '{command}' ({e}), reconnecting.")
+                    self.close()
+                    try:
+                        self.connect()
+                    except Exception as e:
+                        raise SessionLost(f"Reconnect for '{command}' failed: {e}") from e
+                    sent, retried = False, True
+                    continue
+                if chunk is None: break
+                nbytes += len(chunk)
+                text = decoder.decode(chunk)
+                if recording is not None: recording.append(text)
+                *complete, partial = (partial + text).split('\n')
+                for line in complete:
+                    yield from (self._clean(line) + '\n').splitlines()
+                if self.prompt and self._clean(partial).rstrip().endswith(self.prompt):
+                    at_prompt = True
+                    break
+            latency = time.monotonic() - start
+            timed_out = bool(self.prompt) and not at_prompt
+            if timed_out: print(f"Warning: '{command}' did not return to the prompt within {timeout:.0f}s.")
+            self._record_stats(command, latency, nbytes, timed_out)
+            if recording is not None: self._save_recording(command, "".join(recording))
+            tail = self._clean(partial + decoder.decode(b'', final=True))
+            if at_prompt: tail = tail.rstrip()[:-len(self.prompt)]
+            yield from tail.splitlines()
+            finished = not timed_out
+        finally:
+            # A reader that stops early, a failed read or a timeout leaves the rest of the reply in
+            # the channel; start the next command on a fresh session rather than parse leftovers.
+            if not finished: self.close()
+
+    def run_command(self, command, timeout=None):
+        return "\n".join(self.iter_lines(command, timeout))
+
+    def run_batch(self, commands, on_output, timeout=None):
+        """Sends all commands back-to-back and splits the single reply stream on the
+        prompt, calling on_output(command, output) as soon as each one completes so
+        parsing overlaps with the device producing the next output."""
+        self.connect()
+        if not self.prompt:
+            for command in commands: on_output(command, self.run_command(command, timeout))
+            return
+        print(f"Running batch of {len(commands)} commands: {', '.join(commands)}")
+        timeout = timeout or self.command_timeout
+        self.shell.send("".join(command + "\n" for command in commands))
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        partial, body, queue, echoes = "", [], list(commands), set(commands)
+        start = last = time.monotonic()
+        nbytes = 0
+        while queue:
+            chunk = self._recv(last + timeout)
+            if chunk is None:
+                print(f"Warning: batch timed out waiting for '{queue[0]}'; {len(queue)} command(s) lost.")
+                now = time.monotonic()
+                for command in queue: self._record_stats(command, now - last, 0, True)
+                # Replies still in flight would be read as the next job's output.
+                self.close()
+                break
+            nbytes += len(chunk)
+            *complete, partial = (partial + decoder.decode(chunk)).split('\n')
+            for line in complete:
+                line = self._clean(line)
+                # The prompt opens the line after each output, followed by the next typed-ahead echo.
+                if queue and line.startswith(self.prompt):
+                    last = self._finish_batch_command(queue.pop(0), body, echoes, last, on_output)
+                    body, line = [], line[len(self.prompt):]
+                body.extend((line + '\n').splitlines())
+            head = self._clean(partial)
+            if queue and head.startswith(self.prompt):
+                last = self._finish_batch_command(queue.pop(0), body, echoes, last, on_output)
+                body, partial = [], head[len(self.prompt):]
+        print(f"Batch finished in {time.monotonic() - start:.2f}s ({nbytes} bytes)")
+
+    def _finish_batch_command(self, command, body, echoes, since, on_output):
+        now = time.monotonic()
+        # A pty echoes typed-ahead commands as soon as they arrive, so echoes can land in
+        # an earlier command's output; drop them all and lead with this command's echo.
+        output = "\n".join([command] + [line for line in body if line.strip() not in echoes])
+        self._record_stats(command, now - since, len(output.encode('utf-8')), False)
+        self._save_recording(command, output)
+        on_output(command, output)
+        return now
 
 def load_ssh_config(host_alias):
+    import paramiko
     ssh_config_path = os.path.expanduser("~/.ssh/config")
     config = paramiko.SSHConfig()
     with open(ssh_config_path) as f: config.parse(f)
     host_config = config.lookup(host_alias)
-    return host_config.get('hostname'), int(host_config.get('port', 22)), host_config.get('user')
\ No newline at end of file
+    return host_config.get('hostname'), int(host_config.get('port', 22)), host_config.get('user')
@@ -0,0 +1,21 @@
+# collector/state.py
+import config
+import instrumentation
+import samples
+from changes import ChangeTracker
+from history import HistoryStore
+from retention import RetentionEngine, parse_duration
+
+# The collector's long-lived state, shared by main (which processes outputs) and the
+# scheduler (which decides what runs). Built once, when this module is first imported.
+try:
+    retention_seconds = parse_duration(config.CLEANUP_OLDER_THAN)
+except ValueError as e:
+    print(f"Warning: {e}. Keeping data for 7 days.")
+    retention_seconds = 7 * 86400
+history_store = HistoryStore(config.HISTORY_SEGMENT_SECONDS)
+retention = RetentionEngine(config.CLEAN_DATA_DIR, retention_seconds, history_store)
+history_store.on_new_segment = retention.track_segment
+changes = ChangeTracker(config.CHANGE_ONLY_COMMANDS, config.ADAPTIVE_MAX_MULTIPLIER)
+instrumentation.watch_retention(retention)
+instrumentation.watch_label_cache(samples.label_cache_info)
@@ -1,10 +1,49 @@
 # exporter/exporter.py
+import gzip
+import hashlib
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from http.server import HTTPServer, BaseHTTPRequestHandler
+from remote_write import RemoteWriter
 
 DATA_DIR = '/data' 
 PORT = 8000
 
+# 'latest' serves the in-memory snapshots kept from each command's latest.json file;
+# 'scan' walks every command directory for its newest timestamped .txt file per scrape.
+MODE = os.getenv("EXPORTER_MODE", "latest")
+
+# How often the snapshot store checks the snapshot files for changes, in seconds.
+REFRESH_INTERVAL = float(os.getenv("EXPORTER_REFRESH_INTERVAL", "1"))
+
+# Size of the thread pool serving connections, and how long an idle or stalled
+# connection may hold a worker before it is dropped, in seconds.
+WORKERS = int(os.getenv("EXPORTER_WORKERS", "8"))
+REQUEST_TIMEOUT = float(os.getenv("EXPORTER_REQUEST_TIMEOUT", "10"))
+
+# Append each sample's collection time to the exposition. Off by default, since
+# Prometheus then no longer marks a series stale as soon as it disappears.
+TIMESTAMPS = os.getenv("EXPORTER_TIMESTAMPS", "false").lower() in ("1", "true", "yes")
+
+# Optional push of every collected snapshot, with its collection timestamps, to a
+# Prometheus remote-write endpoint (e.g. http://prometheus:9090/api/v1/write); empty disables it.
+# Batches wait in REMOTE_WRITE_QUEUE_DIR until accepted, up to REMOTE_WRITE_MAX_QUEUE_MB.
+REMOTE_WRITE_URL = os.getenv("REMOTE_WRITE_URL", "")
+REMOTE_WRITE_QUEUE_DIR = os.getenv("REMOTE_WRITE_QUEUE_DIR", "/queue")
+REMOTE_WRITE_INTERVAL = float(os.getenv("REMOTE_WRITE_INTERVAL", "5"))
+REMOTE_WRITE_BATCH_SIZE = int(os.getenv("REMOTE_WRITE_BATCH_SIZE", "2000"))
+REMOTE_WRITE_MAX_QUEUE_MB = float(os.getenv("REMOTE_WRITE_MAX_QUEUE_MB", "256"))
+
+LATEST_FILENAME = 'latest.json'
+# Text snapshots written by collectors before structured snapshots; served as-is.
+LEGACY_FILENAME = 'latest.prom'
+
+TEXT_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
 def find_latest_file(directory):
     try:
         files = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.txt')]
@@ -13,43 +52,249 @@ def find_latest_file(directory):
     except FileNotFoundError:
         return None
 
+def iter_command_dirs(data_dir):
+    """Yields every command directory, laid out either as <device>/<command> or,
+    for data written before multi-device support, directly as <command>."""
+    try:
+        entries = list(os.scandir(data_dir))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if not entry.is_dir(): continue
+        if os.path.exists(os.path.join(entry.path, LATEST_FILENAME)) or os.path.exists(os.path.join(entry.path, LEGACY_FILENAME)):
+            yield entry.path
+            continue
+        subdirs = [sub.path for sub in os.scandir(entry.path) if sub.is_dir()]
+        yield from subdirs if subdirs else [entry.path]
+
+def render_scan():
+    """Legacy mode: builds the response from the newest .txt file of every command directory."""
+    all_metrics = []
+    for command_path in iter_command_dirs(DATA_DIR):
+        latest_file = find_latest_file(command_path)
+        if latest_file:
+            try:
+                with open(latest_file, 'r', encoding='utf-8') as f:
+                    all_metrics.append(f.read())
+            except Exception as e:
+                print(f"Error reading file {latest_file}: {e}")
+    return "\n".join(all_metrics).encode('utf-8')
+
+def build_response(body):
+    """Returns (body, gzipped body, ETag) so a scrape never has to encode or compress anything."""
+    return body, gzip.compress(body, compresslevel=6), '"' + hashlib.sha1(body).hexdigest() + '"'
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match is '*' or a comma-separated list of entity tags, compared weakly (W/ ignored)."""
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or any((tag[2:] if tag.startswith('W/') else tag) == etag for tag in tags)
+
+def _format_value(value):
+    if value.is_integer() and abs(value) < 1e15: return str(int(value))
+    if value != value: return 'NaN'
+    if value in (float('inf'), float('-inf')): return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+def merge(snapshots):
+    """Merges structured snapshots (see the collector's samples.write_snapshot) into
+    {family: (type, help, {(sample name, labels): (value, timestamp)})}. A series
+    reported by more than one snapshot keeps its newest value."""
+    families = {}
+    for snapshot in snapshots:
+        collected_at = snapshot['timestamp']
+        for name, metric_type, help_text, rows in snapshot['families']:
+            family = families.get(name)
+            if family is None: family = families[name] = (metric_type, help_text, {})
+            series = family[2]
+            for row in rows:
+                timestamp = row[3] if len(row) > 3 else collected_at
+                key = (name + row[2] if len(row) > 2 else name, row[0])
+                current = series.get(key)
+                if current is None or timestamp >= current[1]: series[key] = (float(row[1]), timestamp)
+    return families
+
+def encode(families, openmetrics=False, timestamps=TIMESTAMPS):
+    """Renders merged families as Prometheus text (0.0.4) or OpenMetrics 1.0, with HELP and TYPE."""
+    out = []
+    for name in sorted(families):
+        metric_type, help_text, series = families[name]
+        totals = metric_type == 'counter' and all(sample_name == name + '_total' for sample_name, _ in series)
+        help_text = help_text.replace('\\', '\\\\').replace('\n', '\\n')
+        if openmetrics:
+            # OpenMetrics counters must be exposed as <family>_total; the ONT's counters keep
+            # the names dashboards already use, so they go out as unknown instead.
+            if metric_type == 'counter' and not totals: metric_type = 'unknown'
+            help_text = help_text.replace('"', '\\"')
+            out.append(f"# TYPE {name} {metric_type}\n# HELP {name} {help_text}\n")
+        else:
+            family_name = name + '_total' if totals else name
+            out.append(f"# HELP {family_name} {help_text}\n# TYPE {family_name} {'untyped' if metric_type == 'unknown' else metric_type}\n")
+        for (sample_name, labels), (value, timestamp) in series.items():
+            if not timestamps: out.append(f"{sample_name}{labels} {_format_value(value)}\n")
+            elif openmetrics: out.append(f"{sample_name}{labels} {_format_value(value)} {timestamp:.3f}\n")
+            else: out.append(f"{sample_name}{labels} {_format_value(value)} {int(timestamp * 1000)}\n")
+    if openmetrics: out.append("# EOF\n")
+    return "".join(out)
+
+class SnapshotStore:
+    """Keeps the latest snapshot of every command in memory and prebuilt responses.
+
+    The collector replaces `<command>/latest.json` atomically on every run, so refresh()
+    only has to stat one file per command and re-load the ones whose mtime moved. The
+    merged families are re-encoded, gzipped and ETagged only when a snapshot changed,
+    and at most once per exposition format.
+    """
+    def __init__(self, data_dir, on_snapshot=None):
+        self.data_dir = data_dir
+        self.on_snapshot = on_snapshot
+        self.snapshots, self.published, self.dirty = {}, {}, False
+        self.families, self.legacy = {}, []
+        self.responses = {}
+        self.lock = threading.Lock()
+
+    def publish(self, key, snapshot):
+        """Adds a structured snapshot produced by the exporter itself; it is served from the next refresh()."""
+        with self.lock:
+            self.published[key] = snapshot
+            self.dirty = True
+
+    def _load(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f) if path.endswith('.json') else f.read()
+
+    def refresh(self):
+        seen, changed = set(), False
+        for command_path in iter_command_dirs(self.data_dir):
+            for filename in (LATEST_FILENAME, LEGACY_FILENAME):
+                path = os.path.join(command_path, filename)
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+                seen.add(path)
+                cached = self.snapshots.get(path)
+                if cached and cached[0] == mtime: break
+                try:
+                    snapshot = self._load(path)
+                except Exception as e:
+                    print(f"Error reading file {path}: {e}")
+                    break
+                self.snapshots[path] = (mtime, snapshot)
+                changed = True
+                if self.on_snapshot and isinstance(snapshot, dict): self.on_snapshot(snapshot)
+                break
+        for path in set(self.snapshots) - seen:
+            del self.snapshots[path]
+            changed = True
+        if changed or self.dirty or not self.responses:
+            with self.lock:
+                snapshots = [self.snapshots[p][1] for p in sorted(self.snapshots)] + list(self.published.values())
+                self.dirty = False
+            families, legacy = merge(s for s in snapshots if isinstance(s, dict)), [s for s in snapshots if isinstance(s, str)]
+            with self.lock:
+                self.families, self.legacy, self.responses = families, legacy, {}
+            self.response(False)
+        return changed
+
+    def response(self, openmetrics):
+        """(body, gzipped body, ETag, content type) for a format, encoded on first use after a change.
+        Legacy text snapshots cannot be merged into OpenMetrics, so while any exist everything is text."""
+        openmetrics = openmetrics and not self.legacy
+        with self.lock:
+            cached = self.responses.get(openmetrics)
+            if cached is None:
+                body = "\n".join([encode(self.families, openmetrics)] + self.legacy).encode('utf-8')
+                cached = self.responses[openmetrics] = build_response(body) + (OPENMETRICS_CONTENT_TYPE if openmetrics else TEXT_CONTENT_TYPE,)
+            return cached
+
+    def run(self, interval):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Snapshot refresh failed: {e}")
+            time.sleep(interval)
+
+store = SnapshotStore(DATA_DIR)
+
 class MetricsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    timeout = REQUEST_TIMEOUT
+
+    def send_plain(self, code, message):
+        self.send_response(code)
+        self.send_header('Content-Length', str(len(message)))
+        self.end_headers()
+        self.wfile.write(message)
+
     def do_GET(self):
         if self.path == '/metrics':
-            all_metrics = []
             if not os.path.isdir(DATA_DIR):
                 print(f"Error: Data directory '{DATA_DIR}' not found.")
-                self.send_response(500)
+                self.send_plain(500, b"Data directory not found.")
+                return
+            if MODE == 'scan':
+                body, gzipped, etag, content_type = build_response(render_scan()) + (TEXT_CONTENT_TYPE,)
+            else:
+                body, gzipped, etag, content_type = store.response('application/openmetrics-text' in self.headers.get('Accept', ''))
+            use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+            # Each content-coding is its own representation, so the gzipped body gets its own ETag.
+            if use_gzip: etag = etag[:-1] + '-gzip"'
+            if etag_matches(self.headers.get('If-None-Match', ''), etag):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Vary', 'Accept, Accept-Encoding')
                 self.end_headers()
-                self.wfile.write(b"Data directory not found.")
                 return
-            for command_name in os.listdir(DATA_DIR):
-                command_path = os.path.join(DATA_DIR, command_name)
-                if os.path.isdir(command_path):
-                    latest_file = find_latest_file(command_path)
-                    if latest_file:
-                        try:
-                            with open(latest_file, 'r', encoding='utf-8') as f:
-                                all_metrics.append(f.read())
-                        except Exception as e:
-                            print(f"Error reading file {latest_file}: {e}")
-            output = "\n".join(all_metrics).encode('utf-8')
+            output = gzipped if use_gzip else body
             self.send_response(200)
-            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(output)))
+            self.send_header('ETag', etag)
+            self.send_header('Vary', 'Accept, Accept-Encoding')
+            if use_gzip: self.send_header('Content-Encoding', 'gzip')
             self.end_headers()
             self.wfile.write(output)
         else:
-            self.send_response(404)
-            self.end_headers()
-            self.wfile.write(b"Not Found")
+            self.send_plain(404, b"Not Found")
 
     def log_message(self, format, *args):
         return
 
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that hands each connection to a bounded thread pool, so one slow
+    client only ties up its own worker instead of the whole exporter."""
+    def __init__(self, server_address, handler_class, workers=WORKERS):
+        super().__init__(server_address, handler_class)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='exporter')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
 def start_server(port):
+    if MODE != 'scan':
+        if REMOTE_WRITE_URL:
+            writer = RemoteWriter(REMOTE_WRITE_URL, REMOTE_WRITE_QUEUE_DIR, REMOTE_WRITE_INTERVAL, REMOTE_WRITE_BATCH_SIZE, int(REMOTE_WRITE_MAX_QUEUE_MB * (1 << 20)))
+            store.on_snapshot = writer.add
+            threading.Thread(target=writer.run, args=(lambda snapshot: store.publish('remote_write', snapshot),), daemon=True).start()
+            print(f"Remote write enabled: {REMOTE_WRITE_URL} (queue: {REMOTE_WRITE_QUEUE_DIR})")
+        store.refresh()
+        threading.Thread(target=store.run, args=(REFRESH_INTERVAL,), daemon=True).start()
     server_address = ('', port)
-    httpd = HTTPServer(server_address, MetricsHandler)
-    print(f"Exporter started on http://localhost:{port}/metrics")
+    httpd = PooledHTTPServer(server_address, MetricsHandler)
+    print(f"Exporter started on http://localhost:{port}/metrics (mode: {MODE}, workers: {WORKERS})")
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
@@ -57,4 +302,4 @@ def start_server(port):
         httpd.server_close()
 
 if __name__ == '__main__':
-    start_server(PORT)
\ No newline at end of file
+    start_server(PORT)
@@ -0,0 +1,197 @@
+# exporter/remote_write.py
+import os
+import re
+import struct
+import threading
+import time
+import urllib.error
+import urllib.request
+from functools import lru_cache
+
+try:
+    import snappy
+except ImportError:
+    snappy = None  # python-snappy is in requirements.txt; the fallback in snappy_compress() is for development
+
+QUEUE_SUFFIX = '.batch'
+
+# --- Protobuf encoding of prometheus.WriteRequest, by hand ---
+# WriteRequest { repeated TimeSeries timeseries = 1; }
+# TimeSeries   { repeated Label labels = 1; repeated Sample samples = 2; }
+# Label        { string name = 1; string value = 2; }
+# Sample       { double value = 1; int64 timestamp = 2; }  (milliseconds)
+_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+_ESCAPE = re.compile(r'\\(.)')
+_DOUBLE = struct.Struct('<d')
+
+def _varint(n):
+    out = bytearray()
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+def _field(number, payload):
+    """A length-delimited field (strings and embedded messages)."""
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+@lru_cache(maxsize=8192)
+def parse_label_set(labels):
+    """Splits a rendered `{k="v",...}` label set back into (name, value) pairs; the same sets recur every run."""
+    return tuple((k, _ESCAPE.sub(lambda m: '\n' if m.group(1) == 'n' else m.group(1), v)) for k, v in _LABEL.findall(labels))
+
+@lru_cache(maxsize=65536)
+def encode_labels(name, labels):
+    """The Label fields of one series, __name__ included and sorted by name as remote write requires."""
+    pairs = sorted((('__name__', name),) + parse_label_set(labels))
+    return b''.join([_field(1, _field(1, k.encode('utf-8')) + _field(2, v.encode('utf-8'))) for k, v in pairs])
+
+def encode_write_request(series):
+    """series: iterable of (encoded labels, [(value, timestamp in ms), ...]) in time order."""
+    out = []
+    for labels, samples in series:
+        body = labels + b''.join([_field(2, b'\x09' + _DOUBLE.pack(value) + b'\x10' + _varint(timestamp)) for value, timestamp in samples])
+        out.append(_field(1, body))
+    return b''.join(out)
+
+def snappy_compress(data):
+    """Snappy block format, as remote write expects. Without python-snappy (e.g. running
+    from a checkout) the block has literal elements only: valid for any decoder, just not smaller."""
+    if snappy: return snappy.compress(data)
+    out = [_varint(len(data))]
+    for offset in range(0, len(data), 65536):
+        chunk = data[offset:offset + 65536]
+        n = len(chunk) - 1
+        if n < 60: out.append(bytes([n << 2]))
+        elif n < 256: out.append(bytes([60 << 2, n]))
+        else: out.append(bytes([61 << 2]) + struct.pack('<H', n))
+        out.append(chunk)
+    return b''.join(out)
+
+class RemoteWriter:
+    """Pushes the samples of every new snapshot, stamped with their collection time, to a
+    Prometheus remote-write endpoint.
+
+    add() queues a snapshot's samples in memory. Every `interval` seconds they are cut into
+    batches of at most `batch_size` samples, and each batch is encoded, compressed and
+    written to `queue_dir` before anything is sent. Queued batches go out oldest first and
+    are deleted once the receiver accepts them (or rejects them outright with a 4xx). On
+    connection errors, 5xx or 429 they stay queued and sending backs off exponentially.
+    Above `max_queue_bytes` the oldest batches are dropped, so an outage costs bounded disk.
+    """
+    def __init__(self, url, queue_dir, interval=5, batch_size=2000, max_queue_bytes=256 << 20, timeout=10, max_backoff=300):
+        self.url, self.queue_dir, self.interval, self.batch_size = url, queue_dir, interval, batch_size
+        self.max_queue_bytes, self.timeout, self.max_backoff = max_queue_bytes, timeout, max_backoff
+        os.makedirs(queue_dir, exist_ok=True)
+        queued = self._queued()
+        self.seq = int(queued[-1].split('_')[0]) + 1 if queued else 0
+        self.pending, self.lock = [], threading.Lock()
+        self.backoff, self.retry_at = 0, 0
+        self.samples_sent = self.bytes_sent = self.samples_dropped = 0
+        self.batches = {'success': 0, 'retry': 0, 'rejected': 0, 'dropped': 0}
+        self.last_batch_samples = self.last_send_seconds = self.last_success = 0
+
+    def add(self, snapshot):
+        collected_at = snapshot['timestamp']
+        with self.lock:
+            for name, _, _, rows in snapshot['families']:
+                for row in rows:
+                    self.pending.append((name + row[2] if len(row) > 2 else name, row[0], row[1], row[3] if len(row) > 3 else collected_at))
+
+    def _queued(self):
+        return sorted(f for f in os.listdir(self.queue_dir) if f.endswith(QUEUE_SUFFIX))
+
+    def cut_batches(self):
+        """Moves everything added so far into encoded batches in the on-disk queue."""
+        with self.lock:
+            pending, self.pending = self.pending, []
+        for offset in range(0, len(pending), self.batch_size):
+            series = {}
+            for name, labels, value, timestamp in pending[offset:offset + self.batch_size]:
+                samples = series.get((name, labels))
+                if samples is None: samples = series[(name, labels)] = []
+                samples.append((float(value), int(timestamp * 1000)))
+            for samples in series.values(): samples.sort(key=lambda s: s[1])
+            payload = snappy_compress(encode_write_request((encode_labels(*key), samples) for key, samples in series.items()))
+            count = min(self.batch_size, len(pending) - offset)
+            path = os.path.join(self.queue_dir, f"{self.seq:012d}_{count}{QUEUE_SUFFIX}")
+            with open(path + '.tmp', 'wb') as f: f.write(payload)
+            os.replace(path + '.tmp', path)
+            self.seq += 1
+        self._trim()
+
+    def _trim(self):
+        queued = self._queued()
+        sizes = [os.path.getsize(os.path.join(self.queue_dir, f)) for f in queued]
+        total = sum(sizes)
+        for name, size in zip(queued, sizes):
+            if total <= self.max_queue_bytes: break
+            os.remove(os.path.join(self.queue_dir, name))
+            total -= size
+            self.batches['dropped'] += 1
+            self.samples_dropped += _batch_samples(name)
+
+    def send_queued(self):
+        """Sends queued batches oldest first; stops at the first one that has to be retried."""
+        if time.monotonic() < self.retry_at: return
+        for name in self._queued():
+            path = os.path.join(self.queue_dir, name)
+            with open(path, 'rb') as f: payload = f.read()
+            request = urllib.request.Request(self.url, data=payload, method='POST', headers={
+                'Content-Type': 'application/x-protobuf', 'Content-Encoding': 'snappy',
+                'X-Prometheus-Remote-Write-Version': '0.1.0', 'User-Agent': 'ont-exporter'})
+            start = time.monotonic()
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response: response.read()
+                result = 'success'
+            except urllib.error.HTTPError as e:
+                result = 'retry' if e.code >= 500 or e.code == 429 else 'rejected'
+                if result == 'rejected': print(f"Remote write rejected a batch of {_batch_samples(name)} samples: HTTP {e.code}")
+            except (urllib.error.URLError, OSError):
+                result = 'retry'
+            self.batches[result] += 1
+            if result == 'retry':
+                self.backoff = min(self.backoff * 2 or self.interval, self.max_backoff)
+                self.retry_at = time.monotonic() + self.backoff
+                return
+            self.backoff = 0
+            os.remove(path)
+            if result == 'success':
+                self.samples_sent += _batch_samples(name)
+                self.bytes_sent += len(payload)
+                self.last_batch_samples, self.last_send_seconds, self.last_success = _batch_samples(name), time.monotonic() - start, time.time()
+
+    def snapshot(self):
+        """The writer's own metrics, in the collector's structured snapshot format."""
+        queued = self._queued()
+        families = [
+            ('exporter_remote_write_samples', 'counter', 'Samples accepted by the remote-write receiver.', [['', self.samples_sent, '_total']]),
+            ('exporter_remote_write_sent_bytes', 'counter', 'Compressed bytes accepted by the remote-write receiver.', [['', self.bytes_sent, '_total']]),
+            ('exporter_remote_write_batches', 'counter', 'Remote-write batches by outcome.', [[f'{{result="{r}"}}', n, '_total'] for r, n in self.batches.items()]),
+            ('exporter_remote_write_dropped_samples', 'counter', 'Samples dropped because the retry queue was full.', [['', self.samples_dropped, '_total']]),
+            ('exporter_remote_write_last_batch_samples', 'gauge', 'Samples in the last accepted batch.', [['', self.last_batch_samples]]),
+            ('exporter_remote_write_last_send_seconds', 'gauge', 'Duration of the last accepted request.', [['', self.last_send_seconds]]),
+            ('exporter_remote_write_last_success_timestamp_seconds', 'gauge', 'When a batch was last accepted.', [['', self.last_success]]),
+            ('exporter_remote_write_queue_batches', 'gauge', 'Batches waiting in the on-disk retry queue.', [['', len(queued)]]),
+            ('exporter_remote_write_queue_samples', 'gauge', 'Samples waiting in the on-disk retry queue.', [['', sum(_batch_samples(f) for f in queued)]]),
+        ]
+        return {'timestamp': time.time(), 'families': families}
+
+    def run(self, publish=None):
+        """Cuts and sends batches every `interval` seconds; publish(snapshot) receives the writer's metrics."""
+        published = None
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.cut_batches()
+                self.send_queued()
+                snapshot = self.snapshot()
+                if publish and snapshot['families'] != published:
+                    publish(snapshot)
+                    published = snapshot['families']
+            except Exception as e:
+                print(f"Remote write failed: {e}")
+
+def _batch_samples(name):
+    return int(name[:-len(QUEUE_SUFFIX)].split('_')[1])
@@ -0,0 +1,7 @@
+# tests/conftest.py
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+for directory in ('collector', 'exporter', 'benchmarks'):
+    sys.path.insert(0, os.path.join(ROOT, directory))
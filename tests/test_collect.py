@@ -0,0 +1,51 @@
+# tests/test_collect.py
+import json
+import pytest
+import config
+import main
+import state
+from changes import ChangeTracker
+from fake_ont import load_responses
+from history import HistoryStore
+from replay import ReplayMonitor
+
+COMMAND = 'display deviceinfo'
+
+@pytest.fixture
+def collect(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'CLEAN_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(state, 'changes', ChangeTracker([COMMAND]))
+    monkeypatch.setattr(state, 'history_store', HistoryStore(3600))
+    ont = ReplayMonitor(responses={COMMAND: COMMAND + '\n' + load_responses()[COMMAND]}, name='ont')
+    return lambda: main.process_command(COMMAND, ont)
+
+def snapshot(tmp_path):
+    with open(tmp_path / 'ont' / 'display_deviceinfo' / config.LATEST_FILENAME, encoding='utf-8') as f:
+        return json.load(f)
+
+def test_unchanged_output_refreshes_the_snapshot_but_skips_history(tmp_path, collect):
+    collect()
+    first = snapshot(tmp_path)
+    collect()
+    second = snapshot(tmp_path)
+    assert second['timestamp'] > first['timestamp']
+    assert second['families'] == first['families'] and first['families']
+    assert len(list(state.history_store.read(tmp_path / 'ont' / 'display_deviceinfo'))) == 1
+
+def test_unchanged_output_is_not_parsed_again(collect, monkeypatch):
+    import parsers
+    calls = []
+    get_parser = parsers.get_parser
+    monkeypatch.setattr(parsers, 'get_parser', lambda command: calls.append(command) or get_parser(command))
+    for _ in range(3): collect()
+    assert calls == [COMMAND]
+
+def test_output_that_stops_parsing_does_not_republish_the_previous_families(tmp_path, collect, monkeypatch):
+    collect()
+    first = snapshot(tmp_path)
+    ont = ReplayMonitor(responses={COMMAND: COMMAND + '\nError: board is busy'}, name='ont')
+    stamps = []
+    monkeypatch.setattr(main.instrumentation, 'record_snapshot', lambda device, command: stamps.append(command))
+    for _ in range(2): main.process_command(COMMAND, ont)
+    assert snapshot(tmp_path) == first
+    assert stamps == []
@@ -0,0 +1,114 @@
+# tests/test_exporter.py
+import gzip
+import json
+import threading
+import urllib.error
+import urllib.request
+import pytest
+import exporter
+
+def write_snapshot(data_dir, device, command, families, timestamp=1700000000.0):
+    command_dir = data_dir / device / command
+    command_dir.mkdir(parents=True, exist_ok=True)
+    (command_dir / exporter.LATEST_FILENAME).write_text(json.dumps({'timestamp': timestamp, 'families': families}))
+
+TEMPERATURE = [['ont_temperature', 'gauge', 'Temperature.', [['{device="ont"}', 41.5]]]]
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    write_snapshot(tmp_path, 'ont', 'deviceinfo', TEMPERATURE)
+    monkeypatch.setattr(exporter, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(exporter, 'MODE', 'latest')
+    monkeypatch.setattr(exporter, 'store', exporter.SnapshotStore(str(tmp_path)))
+    exporter.store.refresh()
+    httpd = exporter.PooledHTTPServer(('127.0.0.1', 0), exporter.MetricsHandler, workers=2)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/metrics"
+    httpd.shutdown()
+    httpd.server_close()
+
+def get(url, **headers):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+def test_identity_and_gzip_bodies_have_their_own_etags(server):
+    status, headers, body = get(server)
+    assert status == 200 and b'ont_temperature{device="ont"} 41.5' in body
+    gzip_status, gzip_headers, gzipped = get(server, **{'Accept-Encoding': 'gzip'})
+    assert gzip_status == 200 and gzip_headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(gzipped) == body
+    assert headers['ETag'] != gzip_headers['ETag']
+    assert headers['Vary'] == gzip_headers['Vary'] == 'Accept, Accept-Encoding'
+
+def test_if_none_match_compares_whole_entity_tags(server):
+    etag = get(server)[1]['ETag']
+    gzip_etag = get(server, **{'Accept-Encoding': 'gzip'})[1]['ETag']
+    assert get(server, **{'If-None-Match': etag})[0] == 304
+    assert get(server, **{'If-None-Match': f'"other", W/{etag}'})[0] == 304
+    assert get(server, **{'If-None-Match': '*'})[0] == 304
+    assert get(server, **{'If-None-Match': gzip_etag})[0] == 200
+    assert get(server, **{'If-None-Match': gzip_etag, 'Accept-Encoding': 'gzip'})[0] == 304
+    assert get(server, **{'If-None-Match': '"x' + etag[1:]})[0] == 200
+    assert get(server, **{'If-None-Match': etag[:-1] + 'x"'})[0] == 200
+
+def test_etag_changes_with_the_snapshot(server, tmp_path):
+    etag = get(server)[1]['ETag']
+    write_snapshot(tmp_path, 'ont', 'deviceinfo', [['ont_temperature', 'gauge', 'Temperature.', [['{device="ont"}', 43.0]]]], 1700000030.0)
+    exporter.store.refresh()
+    status, headers, body = get(server, **{'If-None-Match': etag})
+    assert status == 200 and headers['ETag'] != etag and b' 43\n' in body
+
+DROPS = ['ont_sfwd_drops', 'counter', 'Dropped packets.', [['{device="ont"}', 7.0]]]
+UPTIME = ['collector_tier_runs', 'counter', 'Completed runs.', [['{tier="30s"}', 3.0, '_total']]]
+
+def test_merge_keeps_the_newest_value_of_each_series():
+    older = {'timestamp': 100.0, 'families': [['ont_temperature', 'gauge', 'Temperature.', [['{device="a"}', 40.0], ['{device="b"}', 50.0]]]]}
+    newer = {'timestamp': 200.0, 'families': [['ont_temperature', 'gauge', 'Temperature.', [['{device="a"}', 41.0], ['{device="b"}', 51.0, '', 90.0]]]]}
+    for snapshots in ([older, newer], [newer, older]):
+        series = exporter.merge(snapshots)['ont_temperature'][2]
+        assert series[('ont_temperature', '{device="a"}')] == (41.0, 200.0)
+        assert series[('ont_temperature', '{device="b"}')] == (50.0, 100.0)  # the row's own timestamp is older
+
+def test_text_format():
+    text = exporter.encode(exporter.merge([{'timestamp': 100.0, 'families': [DROPS, UPTIME]}]), timestamps=False)
+    assert text == ('# HELP collector_tier_runs_total Completed runs.\n# TYPE collector_tier_runs_total counter\n'
+                    'collector_tier_runs_total{tier="30s"} 3\n'
+                    '# HELP ont_sfwd_drops Dropped packets.\n# TYPE ont_sfwd_drops counter\n'
+                    'ont_sfwd_drops{device="ont"} 7\n')
+    assert exporter.encode(exporter.merge([{'timestamp': 100.5, 'families': [DROPS]}]), timestamps=True).endswith(' 7 100500\n')
+
+def test_openmetrics_format():
+    from prometheus_client.openmetrics.parser import text_string_to_metric_families
+    text = exporter.encode(exporter.merge([{'timestamp': 100.0, 'families': [DROPS, UPTIME, TEMPERATURE[0]]}]), openmetrics=True, timestamps=True)
+    assert text.endswith('# EOF\n')
+    assert '# TYPE ont_sfwd_drops unknown\n' in text  # no _total suffix, so not an OpenMetrics counter
+    assert '# TYPE collector_tier_runs counter\n' in text
+    families = {f.name: f for f in text_string_to_metric_families(text)}
+    assert [(s.name, s.value, float(s.timestamp)) for s in families['collector_tier_runs'].samples] == [('collector_tier_runs_total', 3.0, 100.0)]
+    assert families['ont_temperature'].type == 'gauge' and families['ont_temperature'].samples[0].value == 41.5
+
+def test_refresh_reloads_only_changed_snapshots_and_drops_removed_ones(tmp_path):
+    write_snapshot(tmp_path, 'ont-a', 'deviceinfo', TEMPERATURE)
+    write_snapshot(tmp_path, 'ont-b', 'sfwd', [DROPS])
+    loaded = []
+    store = exporter.SnapshotStore(str(tmp_path), on_snapshot=loaded.append)
+    assert store.refresh() and len(loaded) == 2
+    assert not store.refresh() and len(loaded) == 2
+    (tmp_path / 'ont-b' / 'sfwd' / exporter.LATEST_FILENAME).unlink()
+    assert store.refresh()
+    body = store.response(False)[0]
+    assert b'ont_temperature' in body and b'ont_sfwd_drops' not in body
+
+def test_legacy_text_snapshots_are_served_as_text(tmp_path):
+    write_snapshot(tmp_path, 'ont', 'deviceinfo', TEMPERATURE)
+    legacy_dir = tmp_path / 'wap_top'  # the flat <command> layout from before multi-device support
+    legacy_dir.mkdir()
+    (legacy_dir / exporter.LEGACY_FILENAME).write_text('wap_top_mem_used_kb{command="wap_top"} 312456')
+    store = exporter.SnapshotStore(str(tmp_path))
+    store.refresh()
+    body, _, _, content_type = store.response(True)
+    assert content_type == exporter.TEXT_CONTENT_TYPE  # legacy text cannot be merged into OpenMetrics
+    assert b'ont_temperature{device="ont"} 41.5' in body and body.endswith(b'wap_top_mem_used_kb{command="wap_top"} 312456')
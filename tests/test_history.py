@@ -0,0 +1,37 @@
+# tests/test_history.py
+import os
+from history import MAGIC, SEGMENT_SUFFIX, HistoryStore, read_segment
+from samples import Sample
+
+def run(values):
+    return [Sample('ont_cpu', f'{{core="{core}"}}', value) for core, value in values]
+
+def test_segment_round_trip(tmp_path):
+    store = HistoryStore(3600)
+    store.append(tmp_path, run([(0, 1.5), (1, 2.0)]), 7200.0)
+    store.append(tmp_path, run([(1, 3.0), (2, 4.0)]), 7230.0)
+    assert store.segments(tmp_path) == [7200]
+    assert (tmp_path / '7200.series').read_text().splitlines() == ['ont_cpu{core="0"}', 'ont_cpu{core="1"}', 'ont_cpu{core="2"}']
+    assert list(store.read(tmp_path)) == [
+        (7200.0, [('ont_cpu{core="0"}', 1.5), ('ont_cpu{core="1"}', 2.0)]),
+        (7230.0, [('ont_cpu{core="1"}', 3.0), ('ont_cpu{core="2"}', 4.0)]),
+    ]
+    assert [t for t, _ in store.read(tmp_path, since=7210)] == [7230.0]
+
+def test_runs_in_another_window_start_a_new_segment(tmp_path):
+    created = []
+    store = HistoryStore(3600, on_new_segment=lambda command_dir, start: created.append(start))
+    store.append(tmp_path, run([(0, 1.0)]), 3599.0)
+    store.append(tmp_path, run([(0, 2.0)]), 3600.0)
+    assert store.segments(tmp_path) == [0, 3600] == created
+    assert store.drop_older_than(tmp_path, 3600) == (2, os.path.getsize(tmp_path / f'3600{SEGMENT_SUFFIX}') + len('ont_cpu{core="0"}\n'))
+    assert store.segments(tmp_path) == [3600]
+
+def test_torn_block_is_cut_off_after_a_restart(tmp_path):
+    HistoryStore(3600).append(tmp_path, run([(0, 1.0)]), 0.0)
+    with open(tmp_path / f'0{SEGMENT_SUFFIX}', 'ab') as f: f.write(b'\x00' * 7)
+    assert len(list(read_segment(tmp_path / f'0{SEGMENT_SUFFIX}'))) == 1
+    store = HistoryStore(3600)
+    store.append(tmp_path, run([(0, 2.0), (1, 3.0)]), 10.0)
+    assert (tmp_path / f'0{SEGMENT_SUFFIX}').read_bytes().startswith(MAGIC)
+    assert [values for _, _, values in read_segment(tmp_path / f'0{SEGMENT_SUFFIX}')] == [(1.0,), (2.0, 3.0)]
@@ -0,0 +1,20 @@
+# tests/test_instrumentation.py
+import json
+import config
+import instrumentation
+import samples
+import state  # noqa: F401  (registers the label-cache collector)
+
+def test_label_cache_hits_and_misses_are_counters(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'CLEAN_DATA_DIR', str(tmp_path))
+    samples.format_labels({'test': 'label-cache'})
+    samples.format_labels({'test': 'label-cache'})
+    info = samples.label_cache_info()
+    instrumentation.flush()
+    with open(tmp_path / config.COLLECTOR_METRICS_DIR / 'metrics' / config.LATEST_FILENAME, encoding='utf-8') as f:
+        families = {name: (metric_type, rows) for name, metric_type, _, rows in json.load(f)['families']}
+    # flush() formats labels itself, so the counters can only have grown since `info`.
+    hits, misses, size = (families[f'collector_label_cache_{stat}'] for stat in ('hits', 'misses', 'size'))
+    assert hits[0] == misses[0] == 'counter' and size[0] == 'gauge'
+    assert hits[1][0][2] == misses[1][0][2] == '_total' and size[1][0][2] == ''
+    assert hits[1][0][1] >= info.hits > 0 and misses[1][0][1] >= info.misses > 0 and size[1][0][1] >= info.currsize
@@ -0,0 +1,36 @@
+# tests/test_parsers.py
+import os
+import re
+import pytest
+import parsers
+import samples
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'samples')
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+
+def load(filename):
+    with open(os.path.join(SAMPLES_DIR, filename), encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    command = lines[0].strip()
+    return command, [line for line in lines[1:] if not line.lower().startswith('success!')]
+
+def parse(command, lines):
+    prefix = command.replace(' ', '_')
+    port = re.search(r'portnum_(\d+)', prefix)
+    labels = {'command': prefix, 'port': port.group(1) if port else 'unknown'}
+    return list(parsers.get_parser(command)(iter(lines), prefix, labels))
+
+# The golden files hold what the original per-line parsers produced for every recorded
+# sample (same series, same values), rendered as `name{labels} value` lines.
+@pytest.mark.parametrize('filename', sorted(os.listdir(SAMPLES_DIR)))
+def test_parser_output_matches_golden(filename):
+    command, lines = load(filename)
+    with open(os.path.join(GOLDEN_DIR, command.replace(' ', '_') + '.prom'), encoding='utf-8') as f:
+        expected = f.read()
+    assert samples.render_lines(parse(command, lines)) + '\n' == expected
+
+def test_every_sample_has_metadata():
+    for filename in os.listdir(SAMPLES_DIR):
+        for sample in parse(*load(filename)):
+            metric_type, help_text = parsers.metadata(sample.name)
+            assert metric_type in (samples.COUNTER, samples.GAUGE) and help_text
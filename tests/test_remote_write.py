@@ -0,0 +1,59 @@
+# tests/test_remote_write.py
+import os
+import pytest
+import remote_write
+from remote_write import RemoteWriter, encode_labels, encode_write_request, parse_label_set, snappy_compress
+from remote_write_receiver import RemoteWriteReceiver, decode_write_request, snappy_decompress
+
+@pytest.fixture
+def receiver():
+    receiver = RemoteWriteReceiver().start()
+    yield receiver
+    receiver.stop()
+
+def test_label_sets_are_unescaped():
+    assert parse_label_set('{device="ont",ssid="a\\"b\\\\c\\nd"}') == (('device', 'ont'), ('ssid', 'a"b\\c\nd'))
+    assert parse_label_set('') == ()
+
+def test_write_request_round_trip():
+    series = [
+        (encode_labels('ont_temp', '{zone="cpu",device="ont"}'), [(41.5, 1700000000000), (42.0, 1700000030000)]),
+        (encode_labels('ont_up', ''), [(1.0, 1700000000000)]),
+    ]
+    assert decode_write_request(encode_write_request(series)) == [
+        ({'__name__': 'ont_temp', 'device': 'ont', 'zone': 'cpu'}, [(41.5, 1700000000000), (42.0, 1700000030000)]),
+        ({'__name__': 'ont_up'}, [(1.0, 1700000000000)]),
+    ]
+
+@pytest.mark.parametrize('size', [0, 1, 59, 60, 255, 256, 65536, 200000])
+def test_literal_snappy_fallback_decodes(monkeypatch, size):
+    monkeypatch.setattr(remote_write, 'snappy', None)
+    data = os.urandom(size)
+    assert snappy_decompress(snappy_compress(data)) == data
+
+def snapshot(timestamp, value):
+    return {'timestamp': timestamp, 'families': [
+        ['ont_temp', 'gauge', 'Temperature.', [['{device="ont"}', value]]],
+        ['ont_drops', 'counter', 'Drops.', [['{device="ont"}', value * 2, '_total'], ['{device="ont"}', 5.0, '_total', timestamp - 1]]],
+    ]}
+
+def test_batches_wait_in_the_queue_until_the_receiver_is_back(tmp_path, receiver):
+    writer = RemoteWriter(receiver.url, str(tmp_path), interval=0.01, batch_size=2)
+    receiver.down = True
+    for i in range(3): writer.add(snapshot(1000 + i * 30, float(i)))
+    writer.cut_batches()
+    assert len(writer._queued()) == 5  # 9 samples, batches of 2
+    writer.send_queued()
+    assert writer.batches['retry'] == 1 and len(writer._queued()) == 5
+    assert writer.backoff > 0
+    receiver.down = False
+    writer.retry_at = 0
+    writer.send_queued()
+    assert writer._queued() == [] and writer.samples_sent == receiver.samples == len(receiver.seen) == 9
+    assert ((('__name__', 'ont_drops_total'), ('device', 'ont')), 1029000) in receiver.seen
+
+def test_full_queue_drops_the_oldest_batches(tmp_path):
+    writer = RemoteWriter('http://127.0.0.1:9/api/v1/write', str(tmp_path), batch_size=1, max_queue_bytes=1)
+    writer.add(snapshot(1000, 1.0))
+    writer.cut_batches()
+    assert writer._queued() == [] and writer.samples_dropped == 3 and writer.batches['dropped'] == 3
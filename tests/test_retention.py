@@ -0,0 +1,41 @@
+# tests/test_retention.py
+import os
+import time
+from history import HistoryStore
+from retention import RetentionEngine, parse_duration
+from samples import Sample
+
+def run(values):
+    return [Sample('ont_cpu', f'{{core="{core}"}}', value) for core, value in values]
+
+def test_parse_duration():
+    assert [parse_duration(v) for v in ('7d', '48h', '15m')] == [7 * 86400, 48 * 3600, 900]
+
+def test_retention_deletes_only_expired_items(tmp_path):
+    store = HistoryStore(3600)
+    engine = RetentionEngine(tmp_path, 86400, store)
+    store.on_new_segment = engine.track_segment
+    command_dir = tmp_path / 'ont' / 'wap_top'
+    now = time.time()
+    store.append(command_dir, run([(0, 1.0)]), now - 3 * 86400)
+    store.append(command_dir, run([(0, 1.0)]), now)
+    old_file, new_file = tmp_path / 'old.txt', tmp_path / 'new.txt'
+    old_file.write_text('x')
+    new_file.write_text('x')
+    engine.track_file(old_file, now - 2 * 86400)
+    engine.track_file(new_file)
+    files, _, _ = engine.run_slice(budget=1)
+    assert files == 3  # the old segment pair and old.txt
+    assert not old_file.exists() and new_file.exists()
+    assert store.segments(command_dir) == [store._segment_start(now)]
+    assert [expires_at for expires_at, _, _ in engine.heap] == sorted(expires_at for expires_at, _, _ in engine.heap)
+
+def test_rescan_picks_up_untracked_files(tmp_path):
+    engine = RetentionEngine(tmp_path, 60, HistoryStore(3600))
+    stale = tmp_path / 'ont' / 'cmd' / 'run.txt'
+    stale.parent.mkdir(parents=True)
+    stale.write_text('x')
+    os.utime(stale, (time.time() - 3600, time.time() - 3600))
+    engine.rescan()
+    while engine.scan_stack or engine.heap: engine.run_slice(budget=1)
+    assert not stale.exists()
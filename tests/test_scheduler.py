@@ -0,0 +1,41 @@
+# tests/test_scheduler.py
+import threading
+import time
+import config
+import scheduler
+
+def run_for(tiers, seconds):
+    stop = threading.Event()
+    threading.Timer(seconds, stop.set).start()
+    scheduler.run_forever(tiers, stop)
+
+def test_each_tier_runs_right_away_and_then_on_its_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'CLEAN_DATA_DIR', str(tmp_path))
+    runs = []
+    tier = scheduler.Tier('fast', 0.2, lambda: runs.append(time.monotonic()))
+    start = time.monotonic()
+    run_for([tier], 1.1)
+    assert runs[0] - start < 0.1
+    assert 4 <= tier.runs <= 6
+    assert tier.skipped == tier.overruns == 0
+
+def test_a_tier_still_running_skips_its_ticks_instead_of_queueing(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'CLEAN_DATA_DIR', str(tmp_path))
+    tier = scheduler.Tier('slow', 0.2, time.sleep, 0.5)
+    run_for([tier], 1.3)
+    time.sleep(0.6)  # let the last run finish
+    assert tier.runs >= 2
+    assert tier.overruns == tier.runs
+    assert tier.skipped >= 2
+
+def test_staggered_startup_delays_first_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'CLEAN_DATA_DIR', str(tmp_path))
+    first = {}
+    collection = [scheduler.Tier(name, 10, lambda name=name: first.setdefault(name, time.monotonic())) for name in ('a', 'b')]
+    background = [scheduler.Tier('retention', 10, lambda: first.setdefault('retention', time.monotonic()))]
+    scheduler.stagger(collection, background, 0.5)
+    assert all(0 <= tier.first_delay <= 0.5 for tier in collection) and background[0].first_delay == 0.5
+    start = time.monotonic()
+    run_for(collection + background, 0.9)
+    for tier in collection + background:
+        assert abs(first[tier.name] - start - tier.first_delay) < 0.1
@@ -0,0 +1,80 @@
+# tests/test_ssh_manager.py
+import time
+import pytest
+import instrumentation
+from fake_ont import FakeOnt, load_responses
+from ssh_manager import OntMonitor
+
+RESPONSES = load_responses()
+
+@pytest.fixture(scope='module')
+def server():
+    server = FakeOnt().start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def ont(server):
+    server.latency = 0.0
+    ont = OntMonitor('127.0.0.1', server.port, 'root', server.password, name='fake', command_timeout=5, reconnect_delay=0.2)
+    yield ont
+    ont.close()
+
+@pytest.fixture
+def stats(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(instrumentation, 'record_command', lambda device, stats: recorded.append(stats))
+    return recorded
+
+def body(output):
+    return [line.rstrip() for line in output.splitlines()[1:]]
+
+def expected(command):
+    return [line.rstrip() for line in RESPONSES[command].splitlines()]
+
+def test_run_command_returns_echo_and_body(ont):
+    output = ont.run_command('display deviceinfo')
+    assert output.splitlines()[0].strip() == 'display deviceinfo'
+    assert body(output) == expected('display deviceinfo')
+    assert ont.prompt == 'WAP>'
+
+def test_recovers_after_the_device_drops_the_session(ont, server):
+    ont.run_command('wap top')
+    for _ in range(3):
+        server.drop_connections()
+        start = time.monotonic()
+        output = ont.run_command('wap top')
+        assert time.monotonic() - start < 3
+        assert body(output) == expected('wap top')
+
+def test_timed_out_reply_does_not_leak_into_the_next_command(ont, server, stats):
+    ont.connect()
+    server.latency = 1.5
+    ont.run_command('display deviceinfo', timeout=1)
+    assert stats[-1]['timed_out']
+    assert ont.client is None
+    server.latency = 0.0
+    output = ont.run_command('wap top')
+    assert body(output) == expected('wap top')
+
+def test_batch_splits_replies_on_the_prompt(ont):
+    commands = ['display deviceinfo', 'wap top', 'display lanport workmode', 'display wifi information']
+    outputs = {}
+    ont.connect()
+    ont.run_batch(commands, lambda command, output: outputs.__setitem__(command, output))
+    assert list(outputs) == commands
+    for command in commands:
+        assert outputs[command].splitlines()[0] == command
+        assert body(outputs[command]) == expected(command)
+
+def test_batch_timeout_closes_the_session_and_records_every_lost_command(ont, server, stats):
+    commands = ['display deviceinfo', 'wap top', 'display lanport workmode']
+    outputs = []
+    ont.connect()
+    server.latency = 1.5
+    ont.run_batch(commands, lambda command, output: outputs.append(command), timeout=1)
+    assert outputs == []
+    assert [s['command'] for s in stats if s['timed_out']] == commands
+    assert ont.client is None
+    server.latency = 0.0
+    assert body(ont.run_command('wap top')) == expected('wap top')